@@ -0,0 +1,21 @@
+import sys
+import time
+
+from bot import icon_store, IconAtlas, ICON_ATLAS_TILE
+
+def read_skin_ids(file_path):
+    with open(file_path, 'r') as file:
+        return [line.strip() for line in file if line.strip()]
+
+def main():
+    tile_size = int(sys.argv[1]) if len(sys.argv) > 1 else ICON_ATLAS_TILE
+    skin_ids = read_skin_ids("skins.txt")
+    start = time.perf_counter()
+    stats = IconAtlas.build(skin_ids, icon_store, tile_size)
+    print(f"Atlas generado: {stats['icons']} iconos, {stats['missing']} sin icono en cache, "
+          f"{stats['bytes'] / 1024 ** 2:.1f} MiB en {time.perf_counter() - start:.1f}s")
+    if stats["missing"]:
+        print("Ejecuta descargar.py para completar los iconos que faltan y vuelve a generar el atlas.")
+
+if __name__ == "__main__":
+    main()
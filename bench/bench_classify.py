@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import COSMETIC_RULES_FILE, CosmeticRules
+
+def synthetic_locker(rules_data, items, seed):
+    rng = random.Random(seed)
+    mythic = list(rules_data["mythic_ids"])
+    styled = [rule["id"] for rule in rules_data["style_rules"]]
+    ids = []
+    for i in range(items):
+        roll = rng.random()
+        if roll < 0.05:
+            ids.append(rng.choice(mythic))
+        elif roll < 0.06:
+            ids.append(rng.choice(styled))
+        else:
+            ids.append(f"cid_{i:04d}_athena_commando_{rng.choice('mf')}_synthetic")
+    unlocked = {cid: [rng.choice(["Mat1", "Mat3", "Stage2", "Stage3", "Stage4"])] for cid in styled}
+    return ids, {"unlocked_styles": unlocked}
+
+def classify_legacy(ids, locker_data, rules_data):
+    mythic_ids = rules_data["mythic_ids"]
+    exclusive = rules_data["exclusive_cosmetics"]
+    style_rules = rules_data["style_rules"]
+    converted = []
+    for cid in ids:
+        cid_lower = cid.lower()
+        rarity = "Rare"
+        if cid_lower in [m.lower() for m in mythic_ids]:
+            rarity = "Mythic"
+        make_mythic = False
+        for rule in style_rules:
+            if cid_lower == rule["id"]:
+                if rule.get("exclusive_only", True) and cid.upper() not in exclusive:
+                    continue
+                make_mythic = rule["og_style"] in locker_data["unlocked_styles"].get(cid_lower, [])
+        if cid_lower in [m.lower() for m in mythic_ids]:
+            make_mythic = True
+        if make_mythic or rarity == "Mythic":
+            converted.append(cid)
+    return [cid for cid in ids if cid.lower() in [m.lower() for m in mythic_ids] or cid in converted]
+
+def classify_rules(ids, locker_data, rules):
+    infos = [{"id": cid, "name": cid, "rarity": "Mythic" if rules.is_mythic(cid) else "Rare"} for cid in ids]
+    converted = set()
+    for cosmetic, make_mythic, _ in rules.classify(infos, locker_data, rules.exclusive_cosmetics):
+        if make_mythic:
+            converted.add(cosmetic["id"])
+    return [cid for cid in ids if rules.is_mythic(cid) or cid in converted]
+
+def best_of(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la clasificación mítica antigua con CosmeticRules.")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(COSMETIC_RULES_FILE, "r", encoding="utf-8") as f:
+        rules_data = json.load(f)
+    rules = CosmeticRules(rules_data)
+    ids, locker_data = synthetic_locker(rules_data, args.items, args.seed)
+
+    legacy_s, legacy_mythic = best_of(lambda: classify_legacy(ids, locker_data, rules_data), args.repeat)
+    rules_s, rules_mythic = best_of(lambda: classify_rules(ids, locker_data, rules), args.repeat)
+    if sorted(legacy_mythic) != sorted(rules_mythic):
+        print(f"Resultados distintos: {len(legacy_mythic)} vs {len(rules_mythic)} míticos")
+        return 1
+
+    print(f"{args.items} ítems, {len(rules_mythic)} míticos, mejor de {args.repeat}")
+    print(f"Listas por ítem: {legacy_s * 1000:.1f} ms")
+    print(f"CosmeticRules:   {rules_s * 1000:.1f} ms ({legacy_s / rules_s:.0f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
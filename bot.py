@@ -1,12 +1,33 @@
 import logging
 import os
+import sys
 import re
 import io
 import math
 import json
+import time
+import random
+import zlib
+import struct
+import sqlite3
+import mmap
+import hashlib
 import platform
+import functools
+import contextlib
+import tempfile
+import signal
+import queue
+import threading
+import contextvars
+import weakref
+import traceback
 import asyncio
+import multiprocessing
 import concurrent.futures
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
 from datetime import datetime
 
 import aiohttp
@@ -24,6 +45,58 @@ logger = logging.getLogger(__name__)
 WEBHOOK_URL = None  
 VERIFICATION_COUNT_FILE = "verification_counts_discord.json"
 USER_CONFIG_FOLDER = "user_config"
+COSMETICS_API_URL = "https://fortnite-api.com/v2/cosmetics/br"
+COSMETICS_SNAPSHOT_FILE = os.path.join("cache", "cosmetics_br.json")
+CATALOG_REFRESH_INTERVAL = 6 * 60 * 60
+CATALOG_REFRESH_TIMEOUT = aiohttp.ClientTimeout(total=300, connect=10)
+COSMETICS_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cosmetics.db")
+ICON_CACHE_DIR = "cache"
+ICON_CACHE_MAX_BYTES = 2 * 1024 ** 3
+PLACEHOLDER_IMAGE = "tbd.png"
+MIPMAP_LEVELS = (512, 256, 128, 64)
+MIPMAP_COMPRESSION = 1
+ICON_ATLAS_FILE = os.path.join("cache", "atlas.rgba")
+ICON_ATLAS_INDEX = os.path.join("cache", "atlas.json")
+ICON_ATLAS_TILE = 256
+TILE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+TILE_CACHE_DIR = os.path.join("cache", "tiles")
+TILE_CACHE_DISK_MAX_BYTES = 1024 ** 3
+PREBAKED_DIR = os.path.join("cache", "prebaked")
+PREBAKED_TILE_SIZE = 308
+PREBAKED_COMPRESSION = 6
+NEGATIVE_CACHE_FILE = os.path.join("cache", "negative.json")
+NEGATIVE_CACHE_TTL = 6 * 60 * 60
+NEGATIVE_CACHE_MAX_TTL = 7 * 24 * 60 * 60
+RENDER_POOL_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_POOL_RECYCLE_AFTER = 500
+RENDER_POOL_HEALTH_INTERVAL = 60
+RENDER_POOL_HEALTH_TIMEOUT = 10
+RENDER_POOL_HUNG_TIMEOUT = 120
+RENDER_SHARED_CANVAS = True
+LOOP_BLOCK_BUDGET = float(os.environ.get("LOOP_BLOCK_BUDGET", "0.05"))
+LOOP_LAG_INTERVAL = 0.1
+LOOP_LAG_SAMPLES = 3000
+LOOP_STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD", "0.25"))
+LOOP_LAG_REPORT_INTERVAL = 300
+RENDER_MAX_CONCURRENT = 2
+RENDER_QUEUE_LIMIT = 20
+RENDER_USER_LIMIT = 1
+RENDER_USER_COOLDOWN = 60
+RENDER_QUEUE_UPDATE_INTERVAL = 5
+HTTP_LIMIT = 100
+HTTP_LIMIT_PER_HOST = 20
+HTTP_DNS_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+FORTNITE_API_RATE = 8.0
+FORTNITE_API_BURST = 16
+FORTNITE_API_RETRIES = 3
+FORTNITE_API_BACKOFF = 0.5
+FORTNITE_API_BACKOFF_MAX = 20
+FORTNITE_API_BREAKER_THRESHOLD = 5
+FORTNITE_API_BREAKER_COOLDOWN = 30
+FORTNITE_CDN_RATE = 200.0
+FORTNITE_CDN_BURST = 100
 
 os.makedirs(USER_CONFIG_FOLDER, exist_ok=True)
 
@@ -36,7 +109,6 @@ IOS_TOKEN    = "M2Y2OWU1NmM3NjQ5NDkyYzhjYzI5ZjFhZjA4YThhMTI6YjUxZWU5Y2IxMjIzNGY1
 
 pending_link_changes = set()
 pending_logo_changes = set()
-converted_mythic_ids = []
 idpattern = re.compile(r"athena(.*?):(.*?)_(.*?)")
 
 def get_user_config_path(discord_user_id: int) -> str:
@@ -60,6 +132,24 @@ def save_user_config(discord_user_id: int, config: dict):
     with open(config_path, "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=4)
 
+_verification_lock = threading.Lock()
+
+async def run_blocking(func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def run_in_subprocess(func, *args):
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    finally:
+        await run_blocking(executor.shutdown)
+
+def update_user_config(discord_user_id: int, **changes) -> dict:
+    config = load_user_config(discord_user_id)
+    config.update(changes)
+    save_user_config(discord_user_id, config)
+    return config
+
 def load_verification_counts():
     if os.path.exists(VERIFICATION_COUNT_FILE):
         with open(VERIFICATION_COUNT_FILE, "r") as f:
@@ -70,6 +160,13 @@ def save_verification_counts(counts):
     with open(VERIFICATION_COUNT_FILE, "w") as f:
         json.dump(counts, f)
 
+def increment_verification_count(discord_user_id: str) -> int:
+    with _verification_lock:
+        counts = load_verification_counts()
+        counts[discord_user_id] = counts.get(discord_user_id, 0) + 1
+        save_verification_counts(counts)
+        return counts[discord_user_id]
+
 def bool_to_emoji(value):
     return "✅" if value else "❌"
 
@@ -98,17 +195,246 @@ def mask_account_id(account_id):
         return account_id[:2] + "*" * (len(account_id) - 4) + account_id[-2:]
     return account_id
 
+class HttpClient:
+    def __init__(self, headers: dict = None, root: "HttpClient" = None,
+                 limit: int = HTTP_LIMIT, limit_per_host: int = HTTP_LIMIT_PER_HOST):
+        self.headers = dict(headers or {})
+        self._root = root or self
+        if root is not None:
+            return
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session = None
+        self.counters = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def counter(name):
+            async def _count(session, ctx, params):
+                self.counters[name] += 1
+            return _count
+
+        trace.on_request_start.append(counter("requests"))
+        trace.on_connection_create_end.append(counter("new_connections"))
+        trace.on_connection_reuseconn.append(counter("reused_connections"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+
+    def session(self) -> aiohttp.ClientSession:
+        root = self._root
+        if root._session is None or root._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=root.limit,
+                limit_per_host=root.limit_per_host,
+                ttl_dns_cache=HTTP_DNS_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+            )
+            # Sesion compartida entre usuarios: sin cookie jar para no mezclar cookies de Epic entre cuentas.
+            root._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=HTTP_TIMEOUT,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=[root._trace_config()]
+            )
+        return root._session
+
+    def with_headers(self, headers: dict) -> "HttpClient":
+        return HttpClient({**self.headers, **headers}, root=self._root)
+
+    def request(self, method: str, url: str, **kwargs):
+        if self.headers:
+            kwargs["headers"] = {**self.headers, **(kwargs.get("headers") or {})}
+        return self._root.session().request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    async def __aenter__(self) -> "HttpClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    def stats(self) -> dict:
+        root = self._root
+        counters = dict(root.counters)
+        connections = counters["new_connections"] + counters["reused_connections"]
+        counters["reuse_rate"] = round(counters["reused_connections"] / connections, 3) if connections else 0.0
+        return counters
+
+    async def close(self):
+        root = self._root
+        if root._session is not None and not root._session.closed:
+            logger.info(f"HTTP client stats: {self.stats()}")
+            await root._session.close()
+        root._session = None
+
+http_client = HttpClient()
+
+class UpstreamUnavailable(Exception):
+    pass
+
+class ApiResponse:
+    def __init__(self, status: int, data, headers):
+        self.status = status
+        self.data = data
+        self.headers = headers
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("fortnite-api responde de nuevo, circuito cerrado.")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.trips += 1
+                logger.warning(f"fortnite-api no responde ({self.failures} fallos seguidos), circuito abierto {self.cooldown}s.")
+            self.opened_at = time.monotonic()
+
+def _parse_retry_after(value: str):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class ApiScheduler:
+    def __init__(self, rate: float = FORTNITE_API_RATE, burst: int = FORTNITE_API_BURST,
+                 retries: int = FORTNITE_API_RETRIES, breaker: bool = True):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(FORTNITE_API_BREAKER_THRESHOLD, FORTNITE_API_BREAKER_COOLDOWN) if breaker else None
+        self.retries = retries
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "short_circuited": 0, "failed": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        return min(FORTNITE_API_BACKOFF * 2 ** attempt, FORTNITE_API_BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+    async def request(self, session: aiohttp.ClientSession, method: str, url: str,
+                      read: str = "json", **kwargs) -> ApiResponse:
+        if self.breaker is not None and not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            raise UpstreamUnavailable("circuito abierto")
+        last_error = None
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            self.counters["requests"] += 1
+            retry_after = None
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    if resp.status != 429 and resp.status < 500:
+                        data = None
+                        if resp.status == 200:
+                            data = await resp.json() if read == "json" else await resp.read()
+                        if self.breaker is not None:
+                            self.breaker.record_success()
+                        return ApiResponse(resp.status, data, resp.headers)
+                    last_error = f"HTTP {resp.status}"
+                    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                    if resp.status == 429:
+                        self.counters["throttled"] += 1
+                        self.bucket.pause(retry_after if retry_after is not None else self._backoff(attempt))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = str(e) or type(e).__name__
+            if attempt == self.retries or (retry_after is not None and retry_after > FORTNITE_API_BACKOFF_MAX):
+                break
+            self.counters["retries"] += 1
+            await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+        self.counters["failed"] += 1
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        raise UpstreamUnavailable(last_error)
+
+    async def get(self, session: aiohttp.ClientSession, url: str, read: str = "json", **kwargs) -> ApiResponse:
+        return await self.request(session, "GET", url, read=read, **kwargs)
+
+    def stats(self) -> dict:
+        if self.breaker is None:
+            return dict(self.counters)
+        return dict(self.counters, breaker=self.breaker.state, trips=self.breaker.trips)
+
+fortnite_api = ApiScheduler()
+# El CDN de imagenes no comparte el cupo de 8 req/s de la API ni su circuito.
+fortnite_cdn = ApiScheduler(rate=FORTNITE_CDN_RATE, burst=FORTNITE_CDN_BURST, breaker=False)
+
 async def send_webhook_message(message: str):
 
     global WEBHOOK_URL
     if WEBHOOK_URL:
-        async with aiohttp.ClientSession() as session:
-            webhook_data = {"content": message}
-            async with session.post(WEBHOOK_URL, json=webhook_data) as resp:
-                if resp.status != 204:
-                    logger.error(f"Error enviando mensaje al webhook: {resp.status}")
-                else:
-                    logger.info("Mensaje enviado exitosamente al webhook.")
+        webhook_data = {"content": message}
+        async with http_client.post(WEBHOOK_URL, json=webhook_data) as resp:
+            if resp.status != 204:
+                logger.error(f"Error enviando mensaje al webhook: {resp.status}")
+            else:
+                logger.info("Mensaje enviado exitosamente al webhook.")
     else:
         logger.info("Webhook no está configurado. Se omite el envío del mensaje.")
 
@@ -170,12 +496,12 @@ class EpicUser:
 
 class EpicGenerator:
     def __init__(self) -> None:
-        self.http: aiohttp.ClientSession
+        self.http: HttpClient
         self.user_agent = f"DeviceAuthGenerator/{platform.system()}/{platform.version()}"
         self.access_token = ""
 
     async def start(self) -> None:
-        self.http = aiohttp.ClientSession(headers={"User-Agent": self.user_agent})
+        self.http = http_client.with_headers({"User-Agent": self.user_agent})
         self.access_token = await self.get_access_token()
 
     async def get_access_token(self) -> str:
@@ -409,6 +735,115 @@ rarity_backgroundsV7 = {
     "Frozen Series":    os.path.join(current_dir, "Cuadrados", "CuadradosV2", "hielo.png")
 }
 
+rarity_version_map = {
+    "v1": rarity_backgroundsV1,
+    "v2": rarity_backgroundsV2,
+    "v3": rarity_backgroundsV3,
+    "v4": rarity_backgroundsV4,
+    "v5": rarity_backgroundsV5,
+    "v6": rarity_backgroundsV6,
+    "v7": rarity_backgroundsV7,
+}
+
+class RarityAssets:
+    def __init__(self, version_map: dict):
+        self.version_map = version_map
+        self._resolved = {}
+        self._images = {}
+        self._strips = {}
+        self._scaled = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, path: str):
+        if path in self._resolved:
+            return self._resolved[path]
+        resolved = path if os.path.isfile(path) else None
+        if resolved is None:
+            directory, filename = os.path.split(path)
+            try:
+                for candidate in os.listdir(directory):
+                    if candidate.lower() == filename.lower():
+                        resolved = os.path.join(directory, candidate)
+                        break
+            except OSError:
+                pass
+        self._resolved[path] = resolved
+        return resolved
+
+    def validate(self) -> list:
+        problems = []
+        for version, backgrounds in self.version_map.items():
+            for rarity, path in backgrounds.items():
+                resolved = self._resolve(path)
+                if resolved is None:
+                    problems.append(f"{version}/{rarity}: {path} no existe")
+                    continue
+                try:
+                    with Image.open(resolved) as img:
+                        img.verify()
+                except (UnidentifiedImageError, IOError) as e:
+                    problems.append(f"{version}/{rarity}: {resolved} inválido ({e})")
+        for problem in problems:
+            logger.error(f"Background inválido: {problem}")
+        return problems
+
+    def _decode(self, path: str):
+        resolved = self._resolve(path)
+        if resolved is None:
+            raise IOError(f"Background {path} no encontrado.")
+        with self._lock:
+            img = self._images.get(resolved)
+            if img is None:
+                img = Image.open(resolved).convert("RGBA")
+                self._images[resolved] = img
+        return img
+
+    def load_all(self):
+        for backgrounds in self.version_map.values():
+            for path in backgrounds.values():
+                try:
+                    self._decode(path)
+                except (UnidentifiedImageError, IOError) as e:
+                    logger.error(f"No se pudo precargar el background {path}. Error: {e}")
+
+    def background(self, path: str) -> Image.Image:
+        return self._decode(path).copy()
+
+    def native_size(self, path: str) -> tuple:
+        return self._decode(path).size
+
+    def background_at(self, path: str, size: int) -> Image.Image:
+        key = (path, size)
+        img = self._scaled.get(key)
+        if img is None:
+            img = self._decode(path).resize((size, size), Image.Resampling.LANCZOS)
+            if len(self._scaled) >= 256:
+                self._scaled.clear()
+            self._scaled[key] = img
+        return img.copy()
+
+    def strip_overlay(self, width: int, height: int) -> Image.Image:
+        key = (width, height)
+        strip = self._strips.get(key)
+        if strip is None:
+            strip = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * 0.7)))
+            self._strips[key] = strip
+        return strip
+
+    def memory_report(self) -> dict:
+        report = {}
+        for version, backgrounds in self.version_map.items():
+            total = 0
+            for resolved in {self._resolve(p) for p in backgrounds.values()}:
+                img = self._images.get(resolved)
+                if img is not None:
+                    total += img.width * img.height * len(img.getbands())
+            report[version] = total
+        report["total"] = sum(img.width * img.height * len(img.getbands()) for img in self._images.values())
+        return report
+
+rarity_assets = RarityAssets(rarity_version_map)
+
 rarity_priority = {
     "Mythic": 1,
     "Legendary": 2,
@@ -458,89 +893,104 @@ sub_order = {
 }
 
 
-mythic_ids = [
-    "cid_017_athena_commando_m", "cid_028_athena_commando_f", "eid_tidy", "banner_influencerbanner21", "banner_brseason01", "banner_ot1banner", "banner_ot2banner", "banner_ot3banner", "banner_ot4banner", "banner_ot5banner",
-    "banner_influencerbanner54", "banner_influencerbanner38", "banner_ot6banner", "banner_ot7banner", "banner_ot8banner", "banner_ot9banner", "banner_ot10banner", "banner_ot11banner",
-    "cid_032_athena_commando_m_medieval", "cid_033_athena_commando_f_medieval", "cid_035_athena_commando_m_medieval",
-    "eid_uproar_496sc", "eid_textile_3o8qg", "eid_sunrise_rpz6m", "eid_sleek_s20cu", "eid_sandwichbop", "eid_sahara", "eid_rigormortis", "eid_richfam", "eid_provisitorprotest", "eid_playereleven", "eid_lasagnadance", "eid_jingle", "eid_hoppin", "eid_hnygoodriddance", "eid_hawtchamp", "eid_gleam", "eid_galileo3_t4dko", "eid_eerie_8wgyk", "eid_dumbbell_lift", "eid_downward_8gzua", "eid_cyclone", "eid_cycloneheadbang", "eid_astray", "eid_antivisitorprotest", 
-    "pickaxe_spookyneonred", "pickaxe_id_tbd_crystalshard", "pickaxe_id_461_skullbritecube", "pickaxe_id_398_wildcatfemale", "pickaxe_id_338_bandageninjablue1h", "pickaxe_id_178_speedymidnight", "pickaxe_id_099_modernmilitaryred", "pickaxe_id_077_carbidewhite", "pickaxe_id_044_tacticalurbanhammer", "pickaxe_id_039_tacticalblack", "pickaxe_accumulateretro", 
-    "character_vampirehunter_galaxy", "character_sahara", "character_reconexpert_fncs", "character_masterkeyorder", 
-    "cid_a_329_athena_commando_f_uproar_i5n5z", "cid_a_271_athena_commando_m_fncs_purple", "cid_a_269_athena_commando_f_hastestreet_b563i", "cid_a_256_athena_commando_f_uproarbraids_8iozw", "cid_a_215_athena_commando_f_sunrisecastle_48tiz", "cid_a_216_athena_commando_m_sunrisepalace_bbqy0", "cid_a_208_athena_commando_m_textilepup_c85od", "cid_a_207_athena_commando_m_textileknight_9te8l", "cid_a_206_athena_commando_f_textilesparkle_v8ysa", "cid_a_205_athena_commando_f_textileram_gmrj0", "cid_a_196_athena_commando_f_fncsgreen", "cid_a_189_athena_commando_m_lavish_huu31", "cid_a_139_athena_commando_m_foray_sd8aa", "cid_a_138_athena_commando_f_foray_yqpb0", "cid_a_100_athena_commando_m_downpour_kc39p", "cid_914_athena_commando_f_york_e", "cid_913_athena_commando_f_york_d", "cid_912_athena_commando_f_york_c", "cid_911_athena_commando_f_york_b", "cid_910_athena_commando_f_york", "cid_909_athena_commando_m_york_e", "cid_908_athena_commando_m_york_d", "cid_907_athena_commando_m_york_c", "cid_906_athena_commando_m_york_b", "cid_905_athena_commando_m_york", "cid_753_athena_commando_f_hostile", "cid_547_athena_commando_f_meteorwoman", "cid_424_athena_commando_m_vigilante", "cid_423_athena_commando_f_painter", "cid_376_athena_commando_m_darkshaman", "cid_252_athena_commando_m_muertos", 
-    "bid_102_buckles", "bid_103_clawed", "bid_104_yellowzip", "bid_114_modernmilitaryred", "bid_136_muertosmale", "bid_234_speedymidnight", "bid_240_darkshamanmale", "bid_288_cyberscavengerfemaleblue", "bid_346_blackwidowrogue", "bid_452_bandageninjablue", "bid_604_skullbritecube", 
-    "glider_id_056_carbidewhite", "glider_id_075_modernmilitaryred", "glider_id_092_streetops", "glider_id_122_valentines", "glider_id_131_speedymidnight", "glider_id_137_streetopsstealth", "glider_plaguewaste",
-    "cid_a_256_athena_commando_f_uproarbraids_8iozw", "cid_030_athena_commando_m_halloween", "cid_029_athena_commando_f_halloween", "banner_influencerbanner1",
-    "banner_influencerbanner2", "banner_influencerbanner3", "banner_influencerbanner4", "banner_influencerbanner5", "banner_influencerbanner6", "banner_influencerbanner7",
-    "banner_influencerbanner8", "banner_influencerbanner9", "banner_influencerbanner10", "banner_influencerbanner11", "banner_influencerbanner12", "banner_influencerbanner13", "banner_influencerbanner14", "banner_influencerbanner15", "banner_influencerbanner16",
-    "banner_influencerbanner17", "banner_influencerbanner18", "banner_influencerbanner19", "banner_influencerbanner20", "banner_influencerbanner21", "banner_influencerbanner22",
-    "banner_influencerbanner23", "banner_influencerbanner24", "banner_influencerbanner25", "banner_influencerbanner26", "banner_influencerbanner27", "banner_influencerbanner28",
-    "banner_influencerbanner29", "banner_influencerbanner30", "banner_influencerbanner31", "banner_influencerbanner32", "banner_influencerbanner33", "banner_influencerbanner34",
-    "banner_influencerbanner35", "banner_influencerbanner36", "banner_influencerbanner37", "banner_influencerbanner39", "banner_influencerbanner40", "banner_influencerbanner41", 
-    "banner_influencerbanner42", "banner_influencerbanner43", "banner_influencerbanner44", "banner_influencerbanner45", "banner_influencerbanner46", "banner_influencerbanner47", 
-    "banner_influencerbanner48", "banner_influencerbanner49", "banner_influencerbanner50", "banner_influencerbanner51", "banner_influencerbanner52", "banner_influencerbanner53",
-    "banner_foundertier1banner1", "banner_foundertier1banner2", "banner_foundertier1banner3", "banner_foundertier1banner4", "banner_foundertier2banner1", "banner_foundertier2banner2", 
-    "banner_foundertier2banner3", "banner_foundertier2banner4", "banner_foundertier2banner5", "banner_foundertier2banner6", "banner_foundertier3banner1", "banner_foundertier3banner2", 
-    "banner_foundertier3banner3", "banner_foundertier3banner4", "banner_foundertier3banner5", "banner_foundertier4banner1", "banner_foundertier4banner2", "banner_foundertier4banner3", 
-    "banner_foundertier4banner4", "banner_foundertier4banner5", "banner_foundertier5banner1", "banner_foundertier5banner2", "banner_foundertier5banner3", "banner_foundertier5banner4", "banner_foundertier5banner5",
-    "cid_052_athena_commando_f_psblue", "cid_095_athena_commando_m_founder", "cid_096_athena_commando_f_founder", "cid_138_athena_commando_m_psburnou", 
-    "cid_260_athena_commando_f_streetops", "cid_315_athena_commando_m_teriyakifish", "cid_399_athena_commando_f_ashtonboardwalk", "cid_619_athena_commando_f_techllama",
-    "cid_a_024_athena_commando_f_skirmish_qw2bq", "cid_a_101_athena_commando_m_tacticalwoodlandblue", "cid_a_215_athena_commando_f_sunrisecastle_48tiz",
-    "cid_a_216_athena_commando_m_sunrisepalace_bbqy0", "pickaxe_id_stw004_tier_5", "pickaxe_id_stw005_tier_6", "cid_925_athena_commando_f_tapdance",
-    "bid_072_vikingmale", "cid_138_athena_commando_m_psburnout", "pickaxe_id_stw001_tier_1", "pickaxe_id_stw002_tier_3", "pickaxe_id_stw003_tier_4",
-    "pickaxe_id_stw007_basic", "pickaxe_id_153_roseleader", "pickaxe_id_461_skullbritecube", "glider_id_211_wildcatblue", "glider_id_206_donut",
-    "cid_113_athena_commando_m_blueace", "cid_114_athena_commando_f_tacticalwoodland", "cid_175_athena_commando_m_celestial", "cid_089_athena_commando_m_retrogrey",
-    "cid_174_athena_commando_f_carbidewhite", "cid_183_athena_commando_m_modernmilitaryred", "cid_207_athena_commando_m_footballdudea", "eid_worm",
-    "cid_208_athena_commando_m_footballduded", "cid_209_athena_commando_m_footballdudec", "cid_210_athena_commando_f_footballgirla",
-    "cid_211_athena_commando_f_footballgirlb", "cid_212_athena_commando_f_footballgirlc", "cid_238_athena_commando_f_footballgirld", 
-    "cid_239_athena_commando_m_footballduded", "cid_240_athena_commando_f_plague", "cid_313_athena_commando_m_kpopfashion", "cid_082_athena_commando_m_scavenger",
-    "cid_090_athena_commando_m_tactical", "cid_657_athena_commando_f_techopsblue", "cid_371_athena_commando_m_speedymidnight", "cid_085_athena_commando_m_twitch",
-    "cid_342_athena_commando_m_streetracermetallic", "cid_434_athena_commando_f_stealthhonor", "cid_441_athena_commando_f_cyberscavengerblue", "cid_479_athena_commando_f_davinci",
-    "cid_478_athena_commando_f_worldcup", "cid_515_athena_commando_m_barbequelarry", "cid_516_athena_commando_m_blackwidowrogue", "cid_657_athena_commando_f_techOpsBlue",
-    "cid_619_athena_commando_f_techllama", "cid_660_athena_commando_f_bandageninjablue", "cid_703_athena_commando_m_cyclone", "cid_084_athena_commando_m_assassin", "cid_083_athena_commando_f_tactical",
-    "cid_761_athena_commando_m_cyclonespace", "cid_783_athena_commando_m_aquajacket", "cid_964_athena_commando_m_historian_869bc", "cid_084_athena_commando_m_assassin", "cid_039_athena_commando_f_disco",
-    "eid_ashtonboardwalk", "eid_ashtonsaltlake", "eid_bendy", "eid_bollywood", "eid_chicken", "cid_757_athena_commando_f_wildcat",  "cid_080_athena_commando_m_space",
-    "eid_crackshotclock", "eid_dab", "eid_fireworksspin", "eid_fresh", "eid_griddles", "eid_hiphop01", "eid_iceking", "eid_kpopdance03",
-    "eid_macaroon_45lhe", "eid_ridethepony_athena", "eid_robot", "eid_rockguitar", "eid_solartheory", "eid_taketheL", "eid_tapshuffle", "cid_386_athena_commando_m_streetopsstealth",
-    "eid_torchsnuffer", "eid_trophycelebrationfncs", "eid_trophycelebration", "eid_twistdaytona", "eid_zest_q1k5v", "founderumbrella",
-    "founderglider", "glider_id_001", "glider_id_002_medieval", "glider_id_003_district", "glider_id_004_disco", "glider_id_014_dragon",
-    "glider_id_090_celestial", "glider_id_176_blackmondaycape_4p79k", "glider_id_206_donut", "umbrella_snowflake", "glider_warthog",
-    "glider_voyager", "bid_001_bluesquire", "bid_002_royaleknight", "bid_004_blackknight", "bid_005_raptor", "bid_025_tactical", "eid_electroshuffle", "cid_850_athena_commando_f_skullbritecube",
-    "bid_024_space", "bid_027_scavenger", "bid_029_retrogrey", "bid_030_tacticalrogue", "bid_055_psburnout", "bid_072_vikingmale",
-    "bid_103_clawed", "bid_102_buckles", "bid_138_celestial", "bid_468_cyclone", "bid_520_cycloneuniverse", "halloweenscythe", "eid_floss",
-    "pickaxe_id_013_teslacoil", "pickaxe_id_015_holidaycandycane", "pickaxe_id_021_megalodon", "pickaxe_id_019_heart", "cid_116_athena_commando_m_carbideblack",
-    "pickaxe_id_029_assassin", "pickaxe_id_077_carbidewhite", "pickaxe_id_088_psburnout", "pickaxe_id_116_celestial", "pickaxe_id_011_medieval", "eid_takethel",
-    "pickaxe_id_294_candycane", "pickaxe_id_359_cyclonemale", "pickaxe_id_376_fncs", "pickaxe_id_508_historianmale_6bqsw",
-    "pickaxe_id_804_fncss20male", "pickaxe_id_stw007_basic","cid_259_athena_commando_m_streetops", "pickaxe_lockjaw"
+COSMETIC_RULES_FILE = os.path.join(current_dir, "cosmetic_rules.json")
+
+class CosmeticRules:
+    def __init__(self, data: dict):
+        self.mythic_ids = frozenset(m.lower() for m in data.get("mythic_ids", []))
+        self.exclusive_cosmetics = frozenset(c.upper() for c in data.get("exclusive_cosmetics", []))
+        self.style_rules = {}
+        for rule in data.get("style_rules", []):
+            self.style_rules[rule["id"].lower()] = {
+                "og_style":       rule.get("og_style"),
+                "og_name":        rule.get("og_name"),
+                "default_name":   rule.get("default_name"),
+                "exclusive_only": rule.get("exclusive_only", True),
+                "substitutes":    {k.lower(): v for k, v in rule.get("substitutes", {}).items()},
+            }
+
+    @classmethod
+    def load(cls, path: str = COSMETIC_RULES_FILE) -> 'CosmeticRules':
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def is_mythic(self, cosmetic_id: str) -> bool:
+        return cosmetic_id.lower() in self.mythic_ids
+
+    def apply_style_rule(self, cosmetic: dict, locker_data: dict, exclusive_cosmetics) -> bool:
+        cid_lower = cosmetic["id"].lower()
+        rule = self.style_rules.get(cid_lower)
+        if rule is None:
+            return False
+        if rule["exclusive_only"]:
+            if not (locker_data and exclusive_cosmetics and cosmetic["id"].upper() in exclusive_cosmetics):
+                return False
+        owned = locker_data['unlocked_styles'].get(cid_lower, ()) if locker_data else ()
+        if rule["og_style"] in owned:
+            cosmetic["name"] = rule["og_name"]
+            return True
+        cosmetic["name"] = rule["default_name"]
+        return False
+
+    def substitute_for(self, cosmetic: dict, locker_data: dict):
+        if not locker_data:
+            return None
+        cid_lower = cosmetic["id"].lower()
+        rule = self.style_rules.get(cid_lower)
+        if rule is None:
+            return None
+        for style in locker_data.get('unlocked_styles', {}).get(cid_lower, []):
+            path = rule["substitutes"].get(style.lower())
+            if path:
+                return path
+        return None
+
+    def classify(self, infos: list, locker_data: dict, exclusive_cosmetics) -> list:
+        exclusive = frozenset(c.upper() for c in exclusive_cosmetics) if exclusive_cosmetics else frozenset()
+        classified = []
+        for cosmetic in infos:
+            make_mythic = self.apply_style_rule(cosmetic, locker_data, exclusive)
+            if make_mythic or cosmetic["id"].lower() in self.mythic_ids:
+                cosmetic["rarity"] = "Mythic"
+                make_mythic = True
+            classified.append((cosmetic, make_mythic, self.substitute_for(cosmetic, locker_data)))
+        return classified
+
+cosmetic_rules = CosmeticRules.load()
+
+COSMETIC_TYPE_RULES = [
+    ("Banners",    ("banner_",), ()),
+    ("Skins",      (), ("character_", "cid_")),
+    ("Backpacks",  (), ("bid_", "backpack")),
+    ("Pickaxe",    (), ("pickaxe_", "pickaxe_id_", "defaultpickaxe", "halloweenscythe")),
+    ("Emotes",     (), ("eid", "emote")),
+    ("Gliders",    (), ("glider", "founderumbrella", "founderglider", "solo_umbrella")),
+    ("Envolturas", (), ("wrap",)),
+    ("Sprays",     (), ("spray",)),
+]
+
+_cosmetic_type_patterns = [
+    (
+        re.compile("|".join(
+            ["^" + re.escape(p) for p in prefixes] + [re.escape(x) for x in substrings]
+        )),
+        cosmetic_type
+    )
+    for cosmetic_type, prefixes, substrings in COSMETIC_TYPE_RULES
 ]
+
+@functools.lru_cache(maxsize=65536)
 def get_cosmetic_type(cosmetic_id: str):
     cid_lower = cosmetic_id.lower()
-    if cid_lower.startswith("banner_"):
-        return "Banners"
-    elif "character_" in cid_lower or "cid_" in cid_lower:
-        return "Skins"
-    elif "bid_" in cid_lower or "backpack" in cid_lower:
-        return "Backpacks"
-    elif (
-        "pickaxe_" in cid_lower
-        or "pickaxe_id_" in cid_lower
-        or "defaultpickaxe" in cid_lower
-        or "halloweenscythe" in cid_lower
-    ):
-        return "Pickaxe"
-    elif "eid" in cid_lower or "emote" in cid_lower:
-        return "Emotes"
-    elif (
-        "glider" in cid_lower
-        or "founderumbrella" in cid_lower
-        or "founderglider" in cid_lower
-        or "solo_umbrella" in cid_lower
-    ):
-        return "Gliders"
-    elif "wrap" in cid_lower:
-        return "Envolturas"
-    elif "spray" in cid_lower:
-        return "Sprays"
-    else:
-        return "Others"
+    for pattern, cosmetic_type in _cosmetic_type_patterns:
+        if pattern.search(cid_lower):
+            return cosmetic_type
+    return "Others"
+
+def rank_cosmetic_types(ids: list, item_order: list) -> list:
+    ranks = {t: i for i, t in enumerate(item_order)}
+    default_rank = len(item_order)
+    return [ranks.get(get_cosmetic_type(cid), default_rank) for cid in ids]
 
 banner_name_map = {}
 
@@ -566,24 +1016,34 @@ async def download_and_prepare_banners(session: aiohttp.ClientSession, user: Epi
     if not url_banners:
         return []
 
-    banner_api = "https://fortnite-api.com/v1/banners"
-    async with session.get(banner_api) as resp:
-        if resp.status != 200:
+    all_data = await run_blocking(get_cosmetic_store().get_banners, url_banners)
+    missing = [
+        bn.lower() for bn in url_banners
+        if bn.lower() not in all_data and not negative_cache.is_negative(f"banner:{bn.lower()}")
+    ]
+    if missing:
+        banner_api = "https://fortnite-api.com/v1/banners"
+        try:
+            resp = await fortnite_api.get(session, banner_api)
+        except UpstreamUnavailable as e:
+            logger.warning(f"fortnite-api no disponible para banners ({e}), se usan los datos guardados.")
+            resp = None
+        if resp is not None and resp.status != 200:
             logger.warning("No se pudo cargar la lista de banners desde fortnite-api.")
-            all_data = {}
-        else:
-            full_data = await resp.json()
-            all_data = {}
-            for binfo in full_data.get("data", []):
+        elif resp is not None:
+            banners = resp.data.get("data", [])
+            await run_blocking(get_cosmetic_store().upsert_banners, banners)
+            for binfo in banners:
                 b_id = binfo.get("id", "").lower()
                 all_data[b_id] = binfo
-
-    os.makedirs("./cache", exist_ok=True)
+            for bn in missing:
+                if bn not in all_data:
+                    negative_cache.record_miss(f"banner:{bn}")
+            await run_blocking(negative_cache.flush)
 
     final_ids = []
     for bn in url_banners:
         c_id = f"banner_{bn.lower()}"
-        path_img = f"./cache/{c_id}.png"
         info = all_data.get(bn.lower())
         if not info:
             logger.info(f"No hay información de '{bn}' en fortnite-api. Se omite este banner.")
@@ -595,62 +1055,827 @@ async def download_and_prepare_banners(session: aiohttp.ClientSession, user: Epi
         if not icon_url:
             logger.info(f"El banner '{bn}' no tiene icono. Se omite.")
             continue
-        if os.path.exists(path_img) and os.path.getsize(path_img) > 0:
+        if icon_store.contains(c_id) or await run_blocking(icon_store.adopt_legacy, c_id):
             final_ids.append(c_id)
             continue
 
         try:
-            async with session.get(icon_url) as r2:
-                if r2.status == 200:
-                    content = await r2.read()
-                    with open(path_img, "wb") as f:
-                        f.write(content)
-                    final_ids.append(c_id)
-                    logger.info(f"Descargado banner '{bn}' correctamente.")
-                else:
-                    logger.warning(f"No se pudo descargar el banner '{bn}' (HTTP {r2.status}). Se omite.")
+            r2 = await fortnite_cdn.get(session, icon_url, read="bytes")
+            if r2.status == 200:
+                await run_blocking(icon_store.put, c_id, r2.data)
+                final_ids.append(c_id)
+                logger.info(f"Descargado banner '{bn}' correctamente.")
+            else:
+                logger.warning(f"No se pudo descargar el banner '{bn}' (HTTP {r2.status}). Se omite.")
+        except UpstreamUnavailable as e:
+            logger.warning(f"fortnite-api no disponible para el banner '{bn}' ({e}). Se omite por ahora.")
         except Exception as e:
             logger.error(f"Error al descargar banner '{bn}': {e}")
 
+    await run_blocking(icon_store.flush)
     return final_ids
 
+def atomic_write(path: str, data: bytes):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class IconStore:
+    def __init__(self, root: str = ICON_CACHE_DIR, max_bytes: int = ICON_CACHE_MAX_BYTES,
+                 placeholder_path: str = PLACEHOLDER_IMAGE):
+        self.root = root
+        self.placeholder_path = placeholder_path
+        self._placeholder_digest = None
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._icons = None
+        self._objects = None
+        self._total_bytes = 0
+        self._dirty = False
+
+    def _load(self):
+        if self._icons is not None:
+            return
+        icons, objects = {}, {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                icons = data.get("icons", {})
+                objects = {k: list(v) for k, v in data.get("objects", {}).items()}
+            except (OSError, ValueError) as e:
+                logger.error(f"Icon index {self.index_path} unreadable, starting empty: {e}")
+        placeholder = self.placeholder_digest()
+        if placeholder:
+            icons = {cid: d for cid, d in icons.items() if d != placeholder}
+        self._icons = icons
+        self._objects = objects
+        self._total_bytes = sum(entry[0] for entry in objects.values())
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def placeholder_digest(self):
+        if self._placeholder_digest is None and os.path.exists(self.placeholder_path):
+            with open(self.placeholder_path, "rb") as f:
+                self._placeholder_digest = hashlib.sha256(f.read()).hexdigest()
+        return self._placeholder_digest
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.png")
+
+    def mipmap_path(self, digest: str, level: int) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.{level}.rgba.z")
+
+    @staticmethod
+    def encode_mipmap(img: Image.Image, level: int = MIPMAP_COMPRESSION) -> bytes:
+        header = struct.pack("<4sHH", b"MIP1", img.width, img.height)
+        return header + zlib.compress(img.tobytes(), level)
+
+    @staticmethod
+    def decode_mipmap(data: bytes) -> Image.Image:
+        magic, width, height = struct.unpack_from("<4sHH", data)
+        if magic != b"MIP1":
+            raise IOError("Mipmap con cabecera inválida.")
+        return Image.frombytes("RGBA", (width, height), zlib.decompress(data[8:]))
+
+    def _write_mipmaps(self, digest: str, data: bytes) -> tuple:
+        try:
+            img = Image.open(io.BytesIO(data)).convert("RGBA")
+        except (UnidentifiedImageError, IOError) as e:
+            logger.warning(f"No se pudieron generar mipmaps para {digest}: {e}")
+            return 0, []
+        written = 0
+        levels = []
+        native = max(img.size)
+        for level in MIPMAP_LEVELS:
+            if level > native and level != MIPMAP_LEVELS[-1]:
+                continue
+            scale = level / native
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            level_img = img if size == img.size else img.resize(size, Image.Resampling.LANCZOS)
+            encoded = self.encode_mipmap(level_img)
+            atomic_write(self.mipmap_path(digest, level), encoded)
+            written += len(encoded)
+            levels.append(level)
+        return written, levels
+
+    def mipmap_levels(self, digest: str) -> list:
+        with self._lock:
+            self._load()
+            entry = self._objects.get(digest)
+            if entry is None:
+                return []
+            if len(entry) < 3:
+                entry.append([level for level in MIPMAP_LEVELS if os.path.exists(self.mipmap_path(digest, level))])
+                self._dirty = True
+            return list(entry[2])
+
+    def pick_mipmap(self, digest: str, target: int, levels: list = None):
+        if levels is None:
+            levels = self.mipmap_levels(digest)
+        candidates = sorted(levels)
+        if not candidates:
+            return None
+        for level in candidates:
+            if level >= target:
+                return self.mipmap_path(digest, level)
+        return self.mipmap_path(digest, candidates[-1])
+
+    def digest_for(self, cid: str):
+        with self._lock:
+            self._load()
+            digest = self._icons.get(cid.lower())
+            return digest if digest in self._objects else None
+
+    def contains(self, cid: str) -> bool:
+        with self._lock:
+            self._load()
+            return cid.lower() in self._icons
+
+    def path_for(self, cid: str):
+        with self._lock:
+            self._load()
+            digest = self._icons.get(cid.lower())
+            if digest is None or digest not in self._objects:
+                return None
+            self._objects[digest][1] = time.time()
+            self._dirty = True
+            return self.object_path(digest)
+
+    def put(self, cid: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        while True:
+            with self._lock:
+                self._load()
+                known = digest in self._objects and os.path.exists(path)
+            size = None
+            if not known:
+                atomic_write(path, data)
+                mip_bytes, levels = self._write_mipmaps(digest, data)
+                size = len(data) + mip_bytes
+            with self._lock:
+                if size is None:
+                    entry = self._objects.get(digest)
+                    if entry is None:
+                        # Otro put lo desalojo entre los dos locks: hay que volver a escribirlo.
+                        continue
+                    entry[1] = time.time()
+                else:
+                    self._total_bytes += size - self._objects.get(digest, [0, 0])[0]
+                    self._objects[digest] = [size, time.time(), levels]
+                self._icons[cid.lower()] = digest
+                self._dirty = True
+                self._evict(protect=digest)
+            return path
+
+    def adopt_legacy(self, cid: str) -> bool:
+        legacy_path = os.path.join(self.root, f"{cid}.png")
+        if not os.path.isfile(legacy_path) or os.path.getsize(legacy_path) == 0:
+            return False
+        with open(legacy_path, "rb") as f:
+            data = f.read()
+        os.remove(legacy_path)
+        if hashlib.sha256(data).hexdigest() == self.placeholder_digest():
+            return False
+        self.put(cid, data)
+        return True
+
+    def _drop_object(self, digest: str):
+        size = self._objects.pop(digest, [0])[0]
+        self._total_bytes -= size
+        self._dirty = True
+        for path in [self.object_path(digest)] + [self.mipmap_path(digest, l) for l in MIPMAP_LEVELS]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def verify(self, cid: str) -> bool:
+        with self._lock:
+            self._load()
+            digest = self._icons.get(cid.lower())
+        if digest is None:
+            return False
+        try:
+            with open(self.object_path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is not None and hashlib.sha256(data).hexdigest() == digest:
+            return True
+        logger.warning(f"Icono corrupto o ausente para {cid} ({digest[:12]}), se descartará.")
+        with self._lock:
+            self._drop_object(digest)
+            self._icons = {c: d for c, d in self._icons.items() if d != digest}
+        return False
+
+    def _evict(self, protect: str = None):
+        if self._total_bytes <= self.max_bytes:
+            return
+        victims = sorted(
+            (entry[1], digest) for digest, entry in self._objects.items() if digest != protect
+        )
+        evicted = set()
+        for _, digest in victims:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._drop_object(digest)
+            evicted.add(digest)
+        if evicted:
+            self._icons = {cid: d for cid, d in self._icons.items() if d not in evicted}
+            logger.info(f"Evicted {len(evicted)} icons from cache ({self._total_bytes} bytes in use).")
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            icons = dict(self._icons)
+            objects = {digest: list(entry) for digest, entry in self._objects.items()}
+            self._dirty = False
+        atomic_write(self.index_path, json.dumps({"icons": icons, "objects": objects}).encode("utf-8"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {"icons": len(self._icons), "objects": len(self._objects), "bytes": self._total_bytes}
+
+icon_store = IconStore()
+
+class IconAtlas:
+    def __init__(self, data_path: str = ICON_ATLAS_FILE, index_path: str = ICON_ATLAS_INDEX):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.tile_size = 0
+        self._items = {}
+        self._map = None
+        self._view = None
+
+    def open(self) -> bool:
+        if self._map is not None:
+            return True
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            with open(self.data_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.info(f"Atlas de iconos no disponible: {e}")
+            return False
+        self.tile_size = index["tile"]
+        self._items = index["items"]
+        self._view = memoryview(self._map)
+        logger.info(f"Atlas de iconos mapeado: {len(self._items)} iconos de {self.tile_size}px")
+        return True
+
+    def tile(self, cid: str, digest: str = None):
+        if self._view is None:
+            return None
+        entry = self._items.get(cid.lower())
+        if entry is None or (digest is not None and entry[1] != digest):
+            return None
+        size = self.tile_size
+        nbytes = size * size * 4
+        offset = entry[0] * nbytes
+        return Image.frombuffer("RGBA", (size, size), self._view[offset:offset + nbytes], "raw", "RGBA", 0, 1)
+
+    @staticmethod
+    def build(ids, store: IconStore, tile_size: int = ICON_ATLAS_TILE,
+              data_path: str = ICON_ATLAS_FILE, index_path: str = ICON_ATLAS_INDEX) -> dict:
+        items = {}
+        missing = 0
+        os.makedirs(os.path.dirname(data_path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for cid in ids:
+                    key = cid.lower()
+                    digest = store.digest_for(key)
+                    if digest is None or key in items:
+                        missing += digest is None
+                        continue
+                    try:
+                        mip_path = store.pick_mipmap(digest, tile_size)
+                        if mip_path:
+                            with open(mip_path, "rb") as f:
+                                img = IconStore.decode_mipmap(f.read())
+                        else:
+                            img = Image.open(store.object_path(digest)).convert("RGBA")
+                    except (UnidentifiedImageError, IOError) as e:
+                        logger.warning(f"No se pudo añadir {cid} al atlas: {e}")
+                        missing += 1
+                        continue
+                    if img.size != (tile_size, tile_size):
+                        img = img.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+                    out.write(img.tobytes())
+                    items[key] = [len(items), digest]
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        atomic_write(index_path, json.dumps({"tile": tile_size, "items": items}).encode("utf-8"))
+        return {"icons": len(items), "missing": missing, "bytes": len(items) * tile_size * tile_size * 4}
+
+    def stats(self) -> dict:
+        return {"icons": len(self._items), "tile": self.tile_size, "mapped": self._map is not None}
+
+icon_atlas = IconAtlas()
+
+class NegativeCache:
+    def __init__(self, path: str = NEGATIVE_CACHE_FILE, ttl: int = NEGATIVE_CACHE_TTL,
+                 max_ttl: int = NEGATIVE_CACHE_MAX_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.max_ttl = max_ttl
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    entries = {k: list(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                logger.error(f"Negative cache {self.path} unreadable, starting empty: {e}")
+        self._entries = entries
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def is_negative(self, key: str) -> bool:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def record_miss(self, key: str):
+        with self._lock:
+            self._load()
+            misses = self._entries.get(key, [0, 0])[1] + 1
+            ttl = min(self.ttl * 2 ** (misses - 1), self.max_ttl)
+            self._entries[key] = [time.time() + ttl, misses]
+            self._dirty = True
+
+    def clear(self, key: str):
+        with self._lock:
+            self._load()
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        atomic_write(self.path, json.dumps(entries).encode("utf-8"))
+
+negative_cache = NegativeCache()
+
+class CosmeticStore:
+    def __init__(self, db_path: str = COSMETICS_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cosmetics (
+                id            TEXT PRIMARY KEY,
+                name          TEXT,
+                rarity        TEXT,
+                series        TEXT,
+                icon_url      TEXT,
+                smallicon_url TEXT,
+                content_hash  TEXT,
+                fetched_at    REAL
+            );
+            CREATE TABLE IF NOT EXISTS banners (
+                id           TEXT PRIMARY KEY,
+                dev_name     TEXT,
+                icon_url     TEXT,
+                content_hash TEXT,
+                fetched_at   REAL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _hash(entry: dict) -> str:
+        return hashlib.sha1(json.dumps(entry, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_meta(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+            self._conn.commit()
+
+    def load_cosmetics(self) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, rarity, series, icon_url, smallicon_url FROM cosmetics"
+            ).fetchall()
+        return [
+            {"id": r[0], "name": r[1], "rarity": r[2], "series": r[3], "icon": r[4], "smallicon": r[5]}
+            for r in rows
+        ]
+
+    def upsert_cosmetics(self, entries: list) -> int:
+        now = time.time()
+        rows = [
+            (e["id"].lower(), e["name"], e["rarity"], e["series"], e["icon"], e["smallicon"], self._hash(e), now)
+            for e in entries if e.get("id")
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO cosmetics (id, name, rarity, series, icon_url, smallicon_url, content_hash, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, rarity = excluded.rarity, "
+                "series = excluded.series, icon_url = excluded.icon_url, smallicon_url = excluded.smallicon_url, "
+                "content_hash = excluded.content_hash, fetched_at = excluded.fetched_at "
+                "WHERE cosmetics.content_hash IS NOT excluded.content_hash",
+                rows
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def prune_cosmetics(self, keep_ids: list) -> int:
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM keep_ids")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO keep_ids (id) VALUES (?)",
+                [(cid.lower(),) for cid in keep_ids if cid]
+            )
+            deleted = self._conn.execute(
+                "DELETE FROM cosmetics WHERE id NOT IN (SELECT id FROM keep_ids)"
+            ).rowcount
+            self._conn.execute("DELETE FROM keep_ids")
+            self._conn.commit()
+            return deleted
+
+    def get_banners(self, banner_ids: list) -> dict:
+        if not banner_ids:
+            return {}
+        placeholders = ",".join("?" for _ in banner_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, dev_name, icon_url FROM banners WHERE id IN ({placeholders})",
+                [b.lower() for b in banner_ids]
+            ).fetchall()
+        return {r[0]: {"id": r[0], "devName": r[1], "images": {"icon": r[2]}} for r in rows}
+
+    def upsert_banners(self, banners: list) -> int:
+        now = time.time()
+        rows = []
+        for b in banners:
+            b_id = b.get("id", "").lower()
+            if not b_id:
+                continue
+            icon_url = (b.get("images") or {}).get("icon")
+            content_hash = self._hash({"devName": b.get("devName"), "icon": icon_url})
+            rows.append((b_id, b.get("devName"), icon_url, content_hash, now))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO banners (id, dev_name, icon_url, content_hash, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET dev_name = excluded.dev_name, icon_url = excluded.icon_url, "
+                "content_hash = excluded.content_hash, fetched_at = excluded.fetched_at "
+                "WHERE banners.content_hash IS NOT excluded.content_hash",
+                rows
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cosmetic_store = None
+_cosmetic_store_lock = threading.Lock()
+
+def get_cosmetic_store() -> CosmeticStore:
+    global _cosmetic_store
+    with _cosmetic_store_lock:
+        if _cosmetic_store is None:
+            _cosmetic_store = CosmeticStore()
+        return _cosmetic_store
+
+class CosmeticCatalog:
+    def __init__(self, store: CosmeticStore = None, snapshot_path: str = COSMETICS_SNAPSHOT_FILE):
+        self._store = store
+        self.snapshot_path = snapshot_path
+        self.items = {}
+        self.loaded_at = None
+        self._refresh_task = None
+
+    @property
+    def store(self) -> CosmeticStore:
+        if self._store is None:
+            self._store = get_cosmetic_store()
+        return self._store
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.items)
+
+    @staticmethod
+    def _entry(raw: dict) -> dict:
+        images = raw.get("images") or {}
+        series = raw.get("series") or {}
+        return {
+            "id":        raw.get("id", ""),
+            "name":      raw.get("name") or "Unknown",
+            "rarity":    (raw.get("rarity") or {}).get("displayValue", "Common"),
+            "series":    series.get("value"),
+            "icon":      images.get("icon"),
+            "smallicon": images.get("smallIcon"),
+        }
+
+    def load_entries(self, entries: list) -> int:
+        items = {}
+        for entry in entries:
+            cid = entry.get("id", "").lower()
+            if cid:
+                items[cid] = entry
+        self.items = items
+        self.loaded_at = datetime.now()
+        return len(items)
+
+    def load_store(self) -> bool:
+        entries = self.store.load_cosmetics()
+        if not entries:
+            return False
+        count = self.load_entries(entries)
+        logger.info(f"Loaded {count} cosmetics from {self.store.db_path}")
+        return True
+
+    def load_snapshot(self, path: str = None) -> bool:
+        path = path or self.snapshot_path
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read cosmetics snapshot {path}: {e}")
+            return False
+        raw_items = data.get("data", []) if isinstance(data, dict) else data
+        count = self.load_entries([self._entry(raw) for raw in raw_items])
+        logger.info(f"Loaded {count} cosmetics from snapshot {path}")
+        return True
+
+    def _write_snapshot(self, raw: bytes):
+        atomic_write(self.snapshot_path, raw)
+
+    async def refresh(self, session: aiohttp.ClientSession) -> bool:
+        headers = {}
+        etag = await run_blocking(self.store.get_meta, "catalog_etag")
+        last_modified = await run_blocking(self.store.get_meta, "catalog_last_modified")
+        if etag and self.ready:
+            headers["If-None-Match"] = etag
+        if last_modified and self.ready:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            resp = await fortnite_api.get(session, COSMETICS_API_URL, read="bytes", headers=headers,
+                                          timeout=CATALOG_REFRESH_TIMEOUT)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Could not refresh cosmetics catalog, keeping cached data ({e}).")
+            return False
+        if resp.status == 304:
+            logger.info("Cosmetics catalog unchanged since last refresh.")
+            return True
+        if resp.status != 200:
+            logger.warning(f"Could not refresh cosmetics catalog (HTTP {resp.status}).")
+            return False
+        new_etag = resp.headers.get("ETag")
+        new_last_modified = resp.headers.get("Last-Modified")
+
+        # El dump pesa decenas de MB: parsearlo en un hilo seguiria bloqueando el loop por el GIL,
+        # y devolver miles de dicts por IPC tambien; el subproceso escribe directo en SQLite.
+        try:
+            parsed, changed, removed = await run_in_subprocess(_import_cosmetics_dump, self.store.db_path, resp.data)
+        except ValueError as e:
+            logger.warning(f"Cosmetics catalog response unreadable, keeping cached data ({e}).")
+            return False
+        if not parsed:
+            logger.warning("Cosmetics catalog response had no items, keeping cached data.")
+            return False
+        entries = await run_blocking(self.store.load_cosmetics)
+        count = await run_blocking(self.load_entries, entries)
+        await run_blocking(self._write_snapshot, resp.data)
+        if new_etag:
+            await run_blocking(self.store.set_meta, "catalog_etag", new_etag)
+        if new_last_modified:
+            await run_blocking(self.store.set_meta, "catalog_last_modified", new_last_modified)
+        logger.info(f"Cosmetics catalog refreshed with {count} items ({changed} new or changed, {removed} removed).")
+        return True
+
+    async def _refresh_loop(self, interval: int):
+        while True:
+            try:
+                await self.refresh(http_client)
+            except Exception as e:
+                logger.error(f"Error refreshing cosmetics catalog: {e}")
+            await asyncio.sleep(interval)
+
+    def start_background_refresh(self, interval: int = CATALOG_REFRESH_INTERVAL):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval))
+
+    def get(self, cosmetic_id: str):
+        return self.items.get(cosmetic_id.lower())
+
+def _parse_cosmetics_dump(raw: bytes) -> list:
+    data = json.loads(raw)
+    raw_items = data.get("data", []) if isinstance(data, dict) else data
+    return [CosmeticCatalog._entry(item) for item in raw_items or []]
+
+def _import_cosmetics_dump(db_path: str, raw: bytes) -> tuple:
+    entries = _parse_cosmetics_dump(raw)
+    if not entries:
+        return 0, 0, 0
+    store = CosmeticStore(db_path)
+    try:
+        changed = store.upsert_cosmetics(entries)
+        removed = store.prune_cosmetics([e["id"] for e in entries])
+    finally:
+        store.close()
+    return len(entries), changed, removed
+
+cosmetic_catalog = CosmeticCatalog()
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+single_flight = SingleFlight()
+
+async def fetch_cosmetic_entry(cosmetic_id: str, session: aiohttp.ClientSession):
+    url = f"https://fortnite-api.com/v2/cosmetics/br/{cosmetic_id}"
+    resp = await fortnite_api.get(session, url)
+    if resp.status != 200:
+        return None
+    return CosmeticCatalog._entry(resp.data.get("data", {}))
+
 async def get_cosmetic_info(cosmetic_id: str, session: aiohttp.ClientSession) -> dict:
+    info = await single_flight.do(
+        f"info:{cosmetic_id.lower()}",
+        lambda: _resolve_cosmetic_info(cosmetic_id, session)
+    )
+    return dict(info, id=cosmetic_id)
+
+async def _resolve_cosmetic_info(cosmetic_id: str, session: aiohttp.ClientSession) -> dict:
     cid_lower = cosmetic_id.lower()
     if cid_lower.startswith("banner_"):
         if cid_lower in banner_name_map:
             real_name = banner_name_map[cid_lower]
         else:
             real_name = f"Banner {cosmetic_id}"
-        if cid_lower in [m.lower() for m in mythic_ids]:
+        if cosmetic_rules.is_mythic(cid_lower):
             return {"id": cosmetic_id, "rarity": "Mythic", "name": real_name}
         else:
             return {"id": cosmetic_id, "rarity": "Uncommon", "name": real_name}
 
-    url = f"https://fortnite-api.com/v2/cosmetics/br/{cosmetic_id}"
-    async with session.get(url) as resp:
-        if resp.status != 200:
-            return {"id": cosmetic_id, "rarity": "Common", "name": "Unknown"}
-        data = await resp.json()
-        rarity = data.get("data", {}).get("rarity", {}).get("displayValue", "Common")
-        name = data.get("data", {}).get("name", "Unknown")
-        if cid_lower in [m.lower() for m in mythic_ids]:
-            rarity = "Mythic"
+    entry = cosmetic_catalog.get(cid_lower)
+    if entry is None and not negative_cache.is_negative(f"info:{cid_lower}"):
+        try:
+            entry = await fetch_cosmetic_entry(cosmetic_id, session)
+        except UpstreamUnavailable as e:
+            logger.warning(f"fortnite-api no disponible para {cosmetic_id} ({e}), se muestra sin metadatos.")
+            return {"id": cosmetic_id, "rarity": "Common", "name": cosmetic_id}
+        if entry is not None:
+            negative_cache.clear(f"info:{cid_lower}")
+            await run_blocking(get_cosmetic_store().upsert_cosmetics, [entry])
+            cosmetic_catalog.items[cid_lower] = entry
+        else:
+            negative_cache.record_miss(f"info:{cid_lower}")
+    if entry is None:
+        return {"id": cosmetic_id, "rarity": "Common", "name": "Unknown"}
+    return cosmetic_info_from_entry(cosmetic_id, entry)
 
-        if name == "Unknown":
-            name = cosmetic_id
-        return {"id": cosmetic_id, "rarity": rarity, "name": name}
+def cosmetic_info_from_entry(cosmetic_id: str, entry: dict) -> dict:
+    cid_lower = cosmetic_id.lower()
+    rarity = entry["rarity"]
+    name = entry["name"]
+    if cosmetic_rules.is_mythic(cid_lower):
+        rarity = "Mythic"
+
+    if name == "Unknown":
+        name = cosmetic_id
+    return {"id": cosmetic_id, "rarity": rarity, "name": name}
+
+class CheckContext:
+    def __init__(self, locker_data: dict = None, exclusive_cosmetics: list = None):
+        self.locker_data = locker_data if locker_data is not None else {'unlocked_styles': {}}
+        self.exclusive_cosmetics = exclusive_cosmetics
+        self.info = {}
+        self.tiles = {}
+        self.pending_tiles = {}
+        self.size_hints = {}
+        self.converted_mythic_ids = []
+        self.lookups = 0
+
+    async def resolve(self, ids: list, session: aiohttp.ClientSession) -> list:
+        missing = [cid for cid in dict.fromkeys(ids) if cid.lower() not in self.info]
+        if missing:
+            results = await asyncio.gather(*[get_cosmetic_info(cid, session) for cid in missing])
+            self.lookups += len(missing)
+            for info in results:
+                self.info[info["id"].lower()] = info
+        return [dict(self.info[cid.lower()], id=cid) for cid in ids]
+
+    def plan_image(self, ids: list):
+        cell = compute_grid_layout(len(ids))["image_size"]
+        for cid in ids:
+            key = cid.lower()
+            self.size_hints[key] = max(self.size_hints.get(key, 0), cell)
+
+    async def classify(self, ids: list, session: aiohttp.ClientSession) -> list:
+        infos = await self.resolve(ids, session)
+        known = [info for info in infos if info["name"].strip().lower() != "unknown"]
+        converted = set(self.converted_mythic_ids)
+        for cosmetic, make_mythic, _ in cosmetic_rules.classify(known, self.locker_data, self.exclusive_cosmetics):
+            if make_mythic and cosmetic["id"] not in converted:
+                converted.add(cosmetic["id"])
+                self.converted_mythic_ids.append(cosmetic["id"])
+        return self.converted_mythic_ids
+
+def parse_unlocked_styles(profile: dict) -> dict:
+    locker_data = {'unlocked_styles': {}}
+    for item_id, item_data in profile['profileChanges'][0]['profile']['items'].items():
+        template_id = item_data.get('templateId', '')
+        if template_id.startswith('Athena'):
+            lowercase_cosmetic_id = template_id.split(':')[1]
+            if lowercase_cosmetic_id not in locker_data['unlocked_styles']:
+                locker_data['unlocked_styles'][lowercase_cosmetic_id] = []
+            variants = item_data.get('attributes', {}).get('variants', [])
+            for variant in variants:
+                locker_data['unlocked_styles'][lowercase_cosmetic_id].extend(variant.get('owned', []))
+    return locker_data
 
 async def download_cosmetic_images(ids: list, session: aiohttp.ClientSession):
-    if not os.path.exists("./cache"):
-        os.makedirs("./cache")
-
     async def _dl(cid: str):
         cid_lower = cid.lower()
         if cid_lower.startswith("banner_"):
             return
+        await single_flight.do(f"img:{cid_lower}", lambda: _fetch(cid))
 
-        imgpath = f"./cache/{cid}.png"
-        if os.path.exists(imgpath) and os.path.getsize(imgpath) > 0:
+    async def _fetch(cid: str):
+        if icon_store.contains(cid) or await run_blocking(icon_store.adopt_legacy, cid):
+            return
+        if negative_cache.is_negative(f"img:{cid.lower()}"):
             return
 
         urls = [
@@ -658,121 +1883,165 @@ async def download_cosmetic_images(ids: list, session: aiohttp.ClientSession):
             f"https://fortnite-api.com/images/cosmetics/br/{cid}/smallicon.png"
         ]
         for url in urls:
-            async with session.get(url) as r2:
-                if r2.status == 200:
-                    content = await r2.read()
-                    with open(imgpath, "wb") as f:
-                        f.write(content)
-                    logger.info(f"Downloaded image for {cid} from {url}")
-                    return
+            try:
+                r2 = await fortnite_cdn.get(session, url, read="bytes")
+            except UpstreamUnavailable as e:
+                logger.warning(f"fortnite-api no disponible para la imagen de {cid} ({e}), placeholder solo por esta vez.")
+                return
+            if r2.status == 200:
+                await run_blocking(icon_store.put, cid, r2.data)
+                negative_cache.clear(f"img:{cid.lower()}")
+                logger.info(f"Downloaded image for {cid} from {url}")
+                return
 
-        with open(imgpath, "wb") as f:
-            f.write(open("./tbd.png", "rb").read())
+        negative_cache.record_miss(f"img:{cid.lower()}")
         logger.warning(f"Imagen no encontrada para {cid}, usando placeholder.")
 
     await asyncio.gather(*[_dl(i) for i in ids])
-
-async def sort_ids_by_rarity(ids: list, session: aiohttp.ClientSession, item_order: list) -> list:
-    cosmetic_info_tasks = [get_cosmetic_info(i, session) for i in ids]
-    info_list = await asyncio.gather(*cosmetic_info_tasks)
-
-    def get_sort_key(info):
-        rarity = info.get("rarity", "Common")
-        cid    = info.get("id", "")
-        t      = get_cosmetic_type(cid)
-        item_order_rank = item_order.index(t) if t in item_order else len(item_order)
-        rarity_rank     = rarity_priority.get(rarity, 999)
-        sub_rank        = sub_order.get(cid.lower(), 9999)
-        return (item_order_rank, rarity_rank, sub_rank)
-
-    sorted_info_list = sorted(info_list, key=get_sort_key)
-    return [x["id"] for x in sorted_info_list]
-
-def filter_mythic_ids_func(items, converted_mythic_ids_local):
+    await run_blocking(icon_store.flush)
+    await run_blocking(negative_cache.flush)
+
+async def sort_ids_by_rarity(ids: list, session: aiohttp.ClientSession, item_order: list, ctx: CheckContext) -> list:
+    info_list = await ctx.resolve(ids, session)
+
+    type_ranks = rank_cosmetic_types([info.get("id", "") for info in info_list], item_order)
+    sort_keys = [
+        (type_rank, rarity_priority.get(info.get("rarity", "Common"), 999), sub_order.get(info.get("id", "").lower(), 9999))
+        for info, type_rank in zip(info_list, type_ranks)
+    ]
+    order_idx = sorted(range(len(info_list)), key=sort_keys.__getitem__)
+    return [info_list[i]["id"] for i in order_idx]
+
+def filter_mythic_ids_func(items, ctx: CheckContext):
+    converted = set(ctx.converted_mythic_ids)
     mythic_items = []
     for item_type, ids_list in items.items():
         for cid in ids_list:
-            if cid.lower() in [m.lower() for m in mythic_ids] or cid in converted_mythic_ids_local:
+            if cosmetic_rules.is_mythic(cid) or cid in converted:
                 mythic_items.append(cid)
     return mythic_items
 
 
 FONT_PATH = os.path.join(current_dir, "fonts", "font.ttf")
 
-def combine_with_background(
+_font_bytes = None
+
+def _font_source():
+    if _font_bytes is not None:
+        return io.BytesIO(_font_bytes)
+    return FONT_PATH
+
+@functools.lru_cache(maxsize=256)
+def _truetype_font(size: int):
+    return ImageFont.truetype(_font_source(), size=size)
+
+def get_font(size: int):
+    try:
+        return _truetype_font(size)
+    except IOError:
+        return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=16384)
+def text_extent(text: str, size: int) -> tuple:
+    bbox = get_font(size).getbbox(text)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+@functools.lru_cache(maxsize=16384)
+def fit_font_size(texts: tuple, max_width: int, max_size: int, min_size: int) -> int:
+    def fits(size):
+        return all(text_extent(t, size)[0] <= max_width for t in texts)
+
+    if max_size <= min_size or fits(max_size):
+        return max_size
+    best = min_size
+    lo, hi = min_size + 1, max_size - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+SPECIAL_RARITIES = frozenset({
+    "ICON SERIES", "DARK SERIES", "STAR WARS SERIES",
+    "GAMING LEGENDS SERIES", "MARVEL SERIES", "DC SERIES",
+    "SHADOW SERIES", "SLURP SERIES", "LAVA SERIES", "FROZEN SERIES"
+})
+
+def _decorate_tile(
+    tile: Image.Image,
     foreground: Image.Image,
-    background: Image.Image,
     name: str,
     rarity: str,
+    scale: float = 1.0,
     is_banner: bool = False
 ) -> Image.Image:
-    bg = background.convert("RGBA")
     fg = foreground.convert("RGBA")
     if not is_banner:
-        fg = fg.resize(bg.size, Image.Resampling.LANCZOS)
-        bg.paste(fg, (0, 0), fg)
+        fg = fg.resize(tile.size, Image.Resampling.LANCZOS)
+        tile.paste(fg, (0, 0), fg)
     else:
-        fg = fg.resize((192, 192), Image.Resampling.LANCZOS)
-        bg.paste(fg, (32, 12), fg)
-
-    draw = ImageDraw.Draw(bg)
-
-    special_rarities = {
-        "ICON SERIES", "DARK SERIES", "STAR WARS SERIES",
-        "GAMING LEGENDS SERIES", "MARVEL SERIES", "DC SERIES",
-        "SHADOW SERIES", "SLURP SERIES", "LAVA SERIES", "FROZEN SERIES"
-    }
+        banner_size = max(1, round(192 * scale))
+        fg = fg.resize((banner_size, banner_size), Image.Resampling.LANCZOS)
+        tile.paste(fg, (round(32 * scale), round(12 * scale)), fg)
 
     base_max_font_size = 40
-    if rarity.upper() in special_rarities:
+    if rarity.upper() in SPECIAL_RARITIES:
         base_max_font_size = 80
 
     name = name.upper()
-    font_size = base_max_font_size
-    while font_size > 10:
-        try:
-            font = ImageFont.truetype(FONT_PATH, size=font_size)
-        except IOError:
-            font = ImageFont.load_default()
-            break
-        text_bbox = draw.textbbox((0, 0), name, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        if text_width <= bg.width - 20:
-            break
-        font_size -= 1
-
-    try:
-        font = ImageFont.truetype(FONT_PATH, size=font_size)
-    except IOError:
-        font = ImageFont.load_default()
+    font_size = fit_font_size(
+        (name,),
+        tile.width - round(20 * scale),
+        max(1, round(base_max_font_size * scale)),
+        max(1, round(10 * scale))
+    )
+    font = get_font(font_size)
+    text_width, text_height = text_extent(name, font_size)
+    text_x = (tile.width - text_width) // 2
 
-    text_bbox = draw.textbbox((0, 0), name, font=font)
-    text_width  = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
-    text_x = (bg.width - text_width) // 2
+    muro_y_position = int(tile.height * 0.80)
+    muro_height = tile.height - muro_y_position
+    muro = rarity_assets.strip_overlay(tile.width, muro_height)
+    tile.paste(muro, (0, muro_y_position), muro)
 
-    muro_y_position = int(bg.height * 0.80)
-    muro_height = bg.height - muro_y_position
+    text_y = muro_y_position + (muro_height - text_height) // 2
+    ImageDraw.Draw(tile).text((text_x, text_y), name, fill="white", font=font)
 
-    muro = Image.new('RGBA', (bg.width, muro_height), (0, 0, 0, int(255 * 0.7)))
-    bg.paste(muro, (0, muro_y_position), muro)
+    return tile
 
-    text_y = muro_y_position + (muro_height - text_height) // 2
-    draw.text((text_x, text_y), name, fill="white", font=font)
+def combine_with_background(
+    foreground: Image.Image,
+    background: Image.Image,
+    name: str,
+    rarity: str,
+    is_banner: bool = False
+) -> Image.Image:
+    return _decorate_tile(background.convert("RGBA"), foreground, name, rarity, is_banner=is_banner)
 
-    return bg
+def render_tile(
+    foreground: Image.Image,
+    background_path: str,
+    name: str,
+    rarity: str,
+    size: int,
+    is_banner: bool = False
+) -> Image.Image:
+    try:
+        native_width = rarity_assets.native_size(background_path)[0]
+        tile = rarity_assets.background_at(background_path, size)
+    except (UnidentifiedImageError, IOError) as e:
+        logger.error(f"No se pudo abrir el background {background_path}. Error: {e}")
+        native_width = 512
+        tile = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    return _decorate_tile(tile, foreground, name, rarity, size / native_width, is_banner=is_banner)
 
-def combine_images(
-    images,
-    username: str,
-    item_count: int,
-    logo_filename="logo.png",
-    custom_link: str = "discord.gg/reno"
-):
+def compute_grid_layout(num_items: int) -> dict:
     max_width  = 1848
     max_height = 2048
 
-    num_items = len(images)
     base_max_cols = 6
     max_cols = base_max_cols
     num_rows = math.ceil(num_items / max_cols)
@@ -790,14 +2059,31 @@ def combine_images(
     empty_space_height = image_size
     total_height += empty_space_height
 
-    combined_image = Image.new("RGBA", (total_width, total_height), (0, 0, 0, 255))
+    return {
+        "max_cols":           max_cols,
+        "num_rows":           num_rows,
+        "image_size":         image_size,
+        "total_width":        total_width,
+        "total_height":       total_height,
+        "empty_space_height": empty_space_height,
+    }
 
-    for idx, image in enumerate(images):
-        col = idx % max_cols
-        row = idx // max_cols
-        position = (col * image_size, row * image_size)
-        resized_image = image.resize((image_size, image_size), Image.Resampling.LANCZOS)
-        combined_image.paste(resized_image, position, resized_image)
+def cell_position(layout: dict, idx: int) -> tuple:
+    col = idx % layout["max_cols"]
+    row = idx // layout["max_cols"]
+    return (col * layout["image_size"], row * layout["image_size"])
+
+def draw_footer(
+    combined_image: Image.Image,
+    layout: dict,
+    username: str,
+    item_count: int,
+    logo_filename="logo.png",
+    custom_link: str = "discord.gg/reno"
+):
+    total_width        = layout["total_width"]
+    total_height       = layout["total_height"]
+    empty_space_height = layout["empty_space_height"]
 
     try:
         logo = Image.open(logo_filename).convert("RGBA")
@@ -817,33 +2103,13 @@ def combine_images(
     text3 = custom_link
 
     draw = ImageDraw.Draw(combined_image)
-    font_size = logo_height // 3
-
-    try:
-        font = ImageFont.truetype(FONT_PATH, size=font_size)
-    except IOError:
-        font = ImageFont.load_default()
-
-    def measure_text(txt):
-        bbox = font.getbbox(txt)
-        return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-    w1, h1 = measure_text(text1)
-    w2, h2 = measure_text(text2)
-    w3, h3 = measure_text(text3)
-
     max_text_width = total_width - (logo_position[0] + logo_width + 20)
+    font_size = fit_font_size((text1, text2, text3), max_text_width, logo_height // 3, 8)
+    font = get_font(font_size)
 
-    while (w1 > max_text_width or w2 > max_text_width or w3 > max_text_width) and font_size > 8:
-        font_size -= 1
-        try:
-            font = ImageFont.truetype(FONT_PATH, size=font_size)
-        except IOError:
-            font = ImageFont.load_default()
-            break
-        w1, h1 = measure_text(text1)
-        w2, h2 = measure_text(text2)
-        w3, h3 = measure_text(text3)
+    w1, h1 = text_extent(text1, font_size)
+    w2, h2 = text_extent(text2, font_size)
+    w3, h3 = text_extent(text3, font_size)
 
     total_text_height = h1 + h2 + h3 + 10
     text_y_start      = total_height - empty_space_height + (empty_space_height - total_text_height) // 2
@@ -855,6 +2121,25 @@ def combine_images(
 
     return combined_image
 
+def combine_images(
+    images,
+    username: str,
+    item_count: int,
+    logo_filename="logo.png",
+    custom_link: str = "discord.gg/reno"
+):
+    layout = compute_grid_layout(len(images))
+    image_size = layout["image_size"]
+
+    combined_image = Image.new("RGBA", (layout["total_width"], layout["total_height"]), (0, 0, 0, 255))
+
+    for idx, image in enumerate(images):
+        position = cell_position(layout, idx)
+        resized_image = image.resize((image_size, image_size), Image.Resampling.LANCZOS)
+        combined_image.paste(resized_image, position, resized_image)
+
+    return draw_footer(combined_image, layout, username, item_count, logo_filename, custom_link)
+
 async def set_affiliate(session: aiohttp.ClientSession, account_id: str, access_token: str, affiliate_name: str = "king") -> dict:
     async with session.post(
         f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{account_id}/client/SetAffiliateName?profileId=common_core",
@@ -901,14 +2186,14 @@ async def get_account_info(session: aiohttp.ClientSession, user: EpicUser) -> di
             creation_date = datetime.strptime(creation_date, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
         account_info['creation_date'] = creation_date
 
-        external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
-        async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as ext_resp:
-            if ext_resp.status == 200:
-                account_info['externalAuths'] = await ext_resp.json()
-            else:
-                account_info['externalAuths'] = []
+    external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
+    async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as ext_resp:
+        if ext_resp.status == 200:
+            account_info['externalAuths'] = await ext_resp.json()
+        else:
+            account_info['externalAuths'] = []
 
-        return account_info
+    return account_info
 
 async def get_profile_info(session: aiohttp.ClientSession, user: EpicUser) -> dict:
     async with session.post(
@@ -925,14 +2210,14 @@ async def get_profile_info(session: aiohttp.ClientSession, user: EpicUser) -> di
             creation_date = datetime.strptime(creation_date, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
         profile_info['creation_date'] = creation_date
 
-        external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
-        async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as external_resp:
-            if external_resp.status == 200:
-                profile_info['externalAuths'] = await external_resp.json()
-            else:
-                profile_info['externalAuths'] = []
+    external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
+    async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as external_resp:
+        if external_resp.status == 200:
+            profile_info['externalAuths'] = await external_resp.json()
+        else:
+            profile_info['externalAuths'] = []
 
-        return profile_info
+    return profile_info
 
 async def get_vbucks_info(session: aiohttp.ClientSession, user: EpicUser) -> dict:
     async with session.post(
@@ -1015,16 +2300,181 @@ async def get_account_stats(session: aiohttp.ClientSession, user: EpicUser) -> d
             "seasons_info":    seasons_info
         }
 
-def _process_cosmetic_item(args):
+def _render_worker_init(pid_queue=None):
+    global _font_bytes
+    if pid_queue is not None:
+        pid_queue.put(os.getpid())
+    try:
+        with open(FONT_PATH, "rb") as f:
+            _font_bytes = f.read()
+    except OSError as e:
+        logger.error(f"No se pudo cargar la fuente {FONT_PATH}: {e}")
+    rarity_assets.load_all()
+    icon_atlas.open()
+
+def _render_worker_ping():
+    return os.getpid(), rarity_assets.memory_report()
+
+class RenderPool:
+    def __init__(self, max_workers: int = RENDER_POOL_WORKERS, recycle_after: int = RENDER_POOL_RECYCLE_AFTER):
+        self.max_workers = max_workers
+        self.recycle_after = recycle_after
+        self.jobs = 0
+        self.restarts = 0
+        self.generation = 0
+        self._generation_jobs = 0
+        self._pending = 0
+        self._last_progress = time.monotonic()
+        self.worker_memory = {}
+        self._worker_pids = set()
+        self._pid_queue = None
+        self._executor = None
+        self._health_task = None
+
+    def start(self):
+        if self._executor is not None:
+            return
+        # Sin max_tasks_per_child: en 3.11 el pool spawn se cuelga al reciclar el primer worker.
+        mp_context = multiprocessing.get_context("spawn")
+        self._pid_queue = mp_context.Queue()
+        self._worker_pids = set()
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=mp_context,
+            initializer=_render_worker_init,
+            initargs=(self._pid_queue,),
+        )
+        self.generation += 1
+        self._generation_jobs = 0
+        self._last_progress = time.monotonic()
+        logger.info(f"Render pool started with {self.max_workers} workers.")
+
+    def _collect_pids(self) -> set:
+        while True:
+            try:
+                self._worker_pids.add(self._pid_queue.get_nowait())
+            except queue.Empty:
+                return self._worker_pids
+
+    def _terminate_workers(self):
+        for pid in self._collect_pids():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def restart(self, generation: int, terminate: bool = False):
+        if generation != self.generation:
+            return
+        if terminate:
+            self._terminate_workers()
+        old_executor, self._executor = self._executor, None
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+        self.restarts += 1
+        self.start()
+
+    def _submit(self, fn, items: list) -> list:
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self._executor, fn, item) for item in items]
+        for future in futures:
+            future.add_done_callback(self._progress)
+        return futures
+
+    def _progress(self, future):
+        self._last_progress = time.monotonic()
+
+    async def map(self, fn, items: list) -> list:
+        self.start()
+        self._pending += len(items)
+        try:
+            generation = self.generation
+            try:
+                results = await asyncio.gather(*self._submit(fn, items))
+            except concurrent.futures.process.BrokenProcessPool:
+                logger.error("Render pool broken, restarting and retrying.")
+                self.restart(generation)
+                generation = self.generation
+                results = await asyncio.gather(*self._submit(fn, items))
+        finally:
+            self._pending -= len(items)
+        self.jobs += len(items)
+        if generation == self.generation:
+            self._generation_jobs += len(items)
+            if self._generation_jobs >= self.recycle_after:
+                logger.info(f"Render pool reciclado tras {self._generation_jobs} jobs.")
+                self.restart(generation)
+        return results
+
+    async def health_check(self) -> bool:
+        self.start()
+        generation = self.generation
+        if self._pending:
+            stalled = time.monotonic() - self._last_progress
+            if stalled < RENDER_POOL_HUNG_TIMEOUT:
+                return True
+            logger.error(f"Render pool sin progreso en {stalled:.0f}s con {self._pending} jobs pendientes, reiniciando.")
+            self.restart(generation, terminate=True)
+            return False
+        try:
+            pid, report = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self._executor, _render_worker_ping),
+                timeout=RENDER_POOL_HEALTH_TIMEOUT
+            )
+        except concurrent.futures.process.BrokenProcessPool as e:
+            logger.error(f"Render pool roto ({e!r}), reiniciando.")
+            self.restart(generation)
+            return False
+        except asyncio.TimeoutError as e:
+            if self._pending:
+                return True
+            logger.error(f"Render pool health check failed ({e!r}), restarting.")
+            self.restart(generation, terminate=True)
+            return False
+        live = self._collect_pids()
+        self.worker_memory = {p: r for p, r in self.worker_memory.items() if p in live}
+        if pid not in self.worker_memory:
+            logger.info(f"Render worker {pid} backgrounds in memory: {report}")
+        self.worker_memory[pid] = report
+        return True
+
+    async def _health_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            await self.health_check()
+
+    def start_health_checks(self, interval: int = RENDER_POOL_HEALTH_INTERVAL):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    def shutdown(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "jobs": self.jobs,
+            "pending": self._pending,
+            "restarts": self.restarts,
+            "generation": self.generation,
+            "background_bytes": {pid: report["total"] for pid, report in self.worker_memory.items()},
+        }
+
+render_pool = RenderPool()
+
+def _load_foreground(args, target_size: int = None) -> Image.Image:
     cid             = args["cid"]
-    name            = args["name"]
-    rarity          = args["rarity"]
-    background_path = args["background_path"]
     sub_url         = args.get("substitute_image_url")
-
-    imgpath = f"./cache/{cid}.png"
+    imgpath         = args.get("icon_path")
 
     try:
+        if not imgpath and not sub_url:
+            raise IOError("Icono no disponible en cache.")
         if sub_url:
             if sub_url.startswith("http"):
                 logger.info(f"Substitute es URL HTTP para {cid}. Usando placeholder (tbd.png).")
@@ -1033,16 +2483,36 @@ def _process_cosmetic_item(args):
                 logger.info(f"Substitute es ruta local: {sub_url}")
                 img = Image.open(sub_url).convert("RGBA")
         else:
-            img = Image.open(imgpath).convert("RGBA")
+            img = mip_path = None
+            if target_size and target_size <= icon_atlas.tile_size:
+                img = icon_atlas.tile(cid, args.get("icon_digest"))
+            if img is None and target_size and args.get("icon_digest"):
+                mip_path = icon_store.pick_mipmap(args["icon_digest"], target_size, args.get("icon_levels") or [])
+                if mip_path:
+                    try:
+                        with open(mip_path, "rb") as f:
+                            img = IconStore.decode_mipmap(f.read())
+                    except (OSError, IOError, zlib.error, struct.error) as e:
+                        logger.warning(f"Mipmap ilegible para {cid}, se usa el PNG: {e}")
+            if img is None:
+                img = Image.open(imgpath).convert("RGBA")
 
         if img.size == (1, 1):
             raise IOError("Imagen placeholder 1x1.")
     except (UnidentifiedImageError, IOError) as e:
         logger.warning(f"No se pudo abrir la imagen de {cid}, usando placeholder. Error: {e}")
         img = Image.open("./tbd.png").convert("RGBA")
+    return img
+
+def _process_cosmetic_item(args):
+    cid             = args["cid"]
+    name            = args["name"]
+    rarity          = args["rarity"]
+    background_path = args["background_path"]
 
+    img = _load_foreground(args)
     try:
-        background = Image.open(background_path).convert("RGBA")
+        background = rarity_assets.background(background_path)
     except (UnidentifiedImageError, IOError) as e:
         logger.error(f"No se pudo abrir el background {background_path}. Error: {e}")
         background = Image.new("RGBA", (512, 512), (0, 0, 0, 0))
@@ -1051,6 +2521,453 @@ def _process_cosmetic_item(args):
     final_img = combine_with_background(img, background, name, rarity, is_banner=is_banner)
     return final_img
 
+def _tile_key(args: dict) -> tuple:
+    return (
+        args["cid"].lower(),
+        args["rarity"],
+        args.get("rarity_version") or args["background_path"],
+        args["name"],
+        args["substitute_image_url"],
+        args.get("icon_digest")
+    )
+
+def _tile_cacheable(key: tuple) -> bool:
+    substitute, digest = key[4], key[5]
+    if substitute:
+        return not substitute.startswith("http")
+    return digest is not None
+
+class TileCache:
+    def __init__(self, max_bytes: int = TILE_CACHE_MAX_BYTES, spill_dir: str = TILE_CACHE_DIR,
+                 spill_max_bytes: int = TILE_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._spill_sizes = None
+        self._spill_bytes = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _cost(tile: Image.Image) -> int:
+        return tile.width * tile.height * len(tile.getbands())
+
+    def _spill_path(self, key: tuple) -> str:
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, name[:2], f"{name}.rgba.z")
+
+    def _load_spill_index(self):
+        if self._spill_sizes is not None:
+            return
+        self._spill_sizes = {}
+        for root, _, files in os.walk(self.spill_dir):
+            for fname in files:
+                path = os.path.join(root, fname)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                self._spill_sizes[path] = (st.st_size, st.st_mtime)
+        self._spill_bytes = sum(size for size, _ in self._spill_sizes.values())
+
+    def get(self, key: tuple):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+        if self.spill_dir:
+            path = self._spill_path(key)
+            try:
+                with open(path, "rb") as f:
+                    tile = IconStore.decode_mipmap(f.read())
+            except (OSError, IOError, zlib.error):
+                tile = None
+            if tile is not None:
+                self.spill_hits += 1
+                self._touch_spill(path)
+                self._insert(key, tile)
+                return tile
+        self.misses += 1
+        return None
+
+    def _touch_spill(self, path: str):
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            return
+        with self._lock:
+            self._load_spill_index()
+            entry = self._spill_sizes.get(path)
+            if entry is not None:
+                self._spill_sizes[path] = (entry[0], now)
+
+    def put(self, key: tuple, tile: Image.Image):
+        self._insert(key, tile)
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        for key in keys:
+            tile = self.get(key)
+            if tile is not None:
+                found[key] = tile
+        return found
+
+    def put_many(self, items: list):
+        for key, tile in items:
+            self._insert(key, tile)
+
+    def _insert(self, key: tuple, tile: Image.Image):
+        cost = self._cost(tile)
+        if cost > self.max_bytes:
+            return
+        evicted = []
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._bytes -= self._cost(old)
+            self._tiles[key] = tile
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                old_key, old_tile = self._tiles.popitem(last=False)
+                self._bytes -= self._cost(old_tile)
+                self.evictions += 1
+                evicted.append((old_key, old_tile))
+        if self.spill_dir:
+            for old_key, old_tile in evicted:
+                self._spill(old_key, old_tile)
+
+    def _spill(self, key: tuple, tile: Image.Image):
+        path = self._spill_path(key)
+        with self._lock:
+            self._load_spill_index()
+            if path in self._spill_sizes:
+                return
+        data = IconStore.encode_mipmap(tile.convert("RGBA"))
+        try:
+            atomic_write(path, data)
+        except OSError as e:
+            logger.warning(f"No se pudo volcar el tile a disco: {e}")
+            return
+        with self._lock:
+            self._spill_sizes[path] = (len(data), time.time())
+            self._spill_bytes += len(data)
+            if self._spill_bytes <= self.spill_max_bytes:
+                return
+            victims = sorted(self._spill_sizes.items(), key=lambda kv: kv[1][1])
+        for victim, (size, _) in victims:
+            with self._lock:
+                if self._spill_bytes <= self.spill_max_bytes:
+                    break
+                self._spill_sizes.pop(victim, None)
+                self._spill_bytes -= size
+            try:
+                os.remove(victim)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.spill_hits + self.misses
+            return {
+                "tiles": len(self._tiles),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.spill_hits) / lookups, 3) if lookups else 0.0,
+                "spill_bytes": self._spill_bytes,
+            }
+
+tile_cache = TileCache()
+
+class PrebakedTiles:
+    def __init__(self, root: str = PREBAKED_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.tile_size = PREBAKED_TILE_SIZE
+        self._tiles = {}
+        self._dirty = False
+        self.hits = 0
+
+    def load(self) -> int:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifest de tiles precocinados corrupto, se ignora: {e}")
+            return 0
+        self.tile_size = manifest.get("tile", PREBAKED_TILE_SIZE)
+        self._tiles = manifest.get("tiles", {})
+        logger.info(f"Tiles precocinados disponibles: {len(self._tiles)} de {self.tile_size}px")
+        return len(self._tiles)
+
+    @staticmethod
+    def _key(version: str, cid: str) -> str:
+        return f"{version}|{cid.lower()}"
+
+    def tile_path(self, version: str, cid: str) -> str:
+        return os.path.join(self.root, version, f"{cid.lower()}.rgba.z")
+
+    def is_current(self, version: str, cid: str, rarity: str, name: str, digest: str) -> bool:
+        entry = self._tiles.get(self._key(version, cid))
+        return entry is not None and entry == [rarity, name, digest]
+
+    def lookup(self, args: dict, cell: int):
+        if args["substitute_image_url"] or cell > self.tile_size or not args.get("rarity_version"):
+            return None
+        if not self.is_current(args["rarity_version"], args["cid"], args["rarity"], args["name"], args.get("icon_digest")):
+            return None
+        self.hits += 1
+        return self.tile_path(args["rarity_version"], args["cid"])
+
+    def record(self, version: str, cid: str, rarity: str, name: str, digest: str):
+        self._tiles[self._key(version, cid)] = [rarity, name, digest]
+        self._dirty = True
+
+    def flush(self):
+        if not self._dirty:
+            return
+        data = json.dumps({"tile": self.tile_size, "tiles": self._tiles}).encode("utf-8")
+        atomic_write(self.manifest_path, data)
+        self._dirty = False
+
+    def stats(self) -> dict:
+        return {"tiles": len(self._tiles), "tile": self.tile_size, "hits": self.hits}
+
+prebaked_tiles = PrebakedTiles()
+
+def _blit_into_canvas(buf, canvas_width: int, x: int, y: int, tile: Image.Image):
+    cell_w, cell_h = tile.size
+    data = tile.tobytes()
+    row_bytes = cell_w * 4
+    stride = canvas_width * 4
+    for r in range(cell_h):
+        offset = (y + r) * stride + x * 4
+        buf[offset:offset + row_bytes] = data[r * row_bytes:(r + 1) * row_bytes]
+
+def _render_cell(args, cell: int) -> Image.Image:
+    tile = render_tile(
+        _load_foreground(args, cell),
+        args["background_path"],
+        args["name"],
+        args["rarity"],
+        cell,
+        is_banner=args["cid"].lower().startswith("banner_")
+    )
+    cell_img = Image.new("RGBA", (cell, cell), (0, 0, 0, 255))
+    cell_img.paste(tile, (0, 0), tile)
+    return cell_img
+
+def _load_prebaked_cell(path: str, cell: int):
+    try:
+        with open(path, "rb") as f:
+            tile = IconStore.decode_mipmap(f.read())
+    except (OSError, IOError, zlib.error, struct.error) as e:
+        logger.warning(f"Tile precocinado ilegible {path}: {e}")
+        return None
+    if tile.size != (cell, cell):
+        tile = tile.resize((cell, cell), Image.Resampling.LANCZOS)
+    return tile
+
+def _prebake_tile(job):
+    tile = _render_cell(job, job["size"])
+    data = IconStore.encode_mipmap(tile, PREBAKED_COMPRESSION)
+    atomic_write(job["path"], data)
+    return len(data)
+
+def _render_into_canvas(args):
+    canvas = args["canvas"]
+    cell = canvas["cell"]
+    render_size = max(cell, args.get("render_size") or cell)
+    tile = None
+    if args.get("prebaked_path"):
+        tile = _load_prebaked_cell(args["prebaked_path"], render_size)
+    if tile is None:
+        tile = _render_cell(args, render_size)
+    cell_img = tile if render_size == cell else tile.resize((cell, cell), Image.Resampling.LANCZOS)
+
+    shm = shared_memory.SharedMemory(name=canvas["name"])
+    try:
+        _blit_into_canvas(shm.buf, canvas["width"], canvas["x"], canvas["y"], cell_img)
+    finally:
+        shm.close()
+    tile_out = args.get("tile_out")
+    if tile_out is not None:
+        data = tile.tobytes()
+        out = shared_memory.SharedMemory(name=tile_out["name"])
+        try:
+            out.buf[tile_out["offset"]:tile_out["offset"] + len(data)] = data
+        finally:
+            out.close()
+
+def _read_shared_tiles(canvas_shm, canvas_width: int, tiles_shm, owned_jobs: dict) -> dict:
+    tiles = {}
+    for key, job in owned_jobs.items():
+        tile_out = job.get("tile_out")
+        if tile_out is not None:
+            size = job["render_size"]
+            offset = tile_out["offset"]
+            data = bytes(tiles_shm.buf[offset:offset + size * size * 4])
+        else:
+            size = job["canvas"]["cell"]
+            x, y = job["canvas"]["x"], job["canvas"]["y"]
+            row_bytes = size * 4
+            stride = canvas_width * 4
+            data = b"".join(
+                bytes(canvas_shm.buf[(y + r) * stride + x * 4:(y + r) * stride + x * 4 + row_bytes])
+                for r in range(size)
+            )
+        tiles[key] = Image.frombytes("RGBA", (size, size), data)
+    return tiles
+
+def _fill_opaque(buf, width: int, height: int):
+    opaque_row = b"\x00\x00\x00\xff" * width
+    for r in range(height):
+        buf[r * width * 4:(r + 1) * width * 4] = opaque_row
+
+def _compose_canvas(shm, layout: dict, reused: list, jobs: list):
+    width, height = layout["total_width"], layout["total_height"]
+    cell = layout["image_size"]
+    view = shm.buf[:width * height * 4]
+    try:
+        canvas = Image.frombytes("RGBA", (width, height), view)
+    finally:
+        view.release()
+    for tile, x, y in reused:
+        if tile.size != (cell, cell):
+            tile = tile.resize((cell, cell), Image.Resampling.LANCZOS)
+        canvas.paste(tile, (x, y), tile)
+    crops = []
+    for job in jobs:
+        x, y = job["canvas"]["x"], job["canvas"]["y"]
+        crops.append((_tile_key(job), canvas.crop((x, y, x + cell, y + cell))))
+    return canvas, crops
+
+async def render_shared_canvas(work_args_list: list, ctx: CheckContext):
+    layout = compute_grid_layout(len(work_args_list))
+    width, height = layout["total_width"], layout["total_height"]
+    cell = layout["image_size"]
+    tiles = ctx.tiles
+    pending = ctx.pending_tiles
+
+    keys = [_tile_key(args) for args in work_args_list]
+    local = {}
+    for key in keys:
+        tile = tiles.get(key)
+        if tile is not None and tile.width >= cell:
+            local[key] = tile
+    from_cache = await run_blocking(
+        tile_cache.get_many,
+        [key + (cell,) for key in dict.fromkeys(keys) if key not in local and key not in pending and _tile_cacheable(key)]
+    )
+
+    shm = shared_memory.SharedMemory(create=True, size=width * height * 4)
+    tiles_shm = None
+    try:
+        await run_blocking(_fill_opaque, shm.buf, width, height)
+
+        def job_for(args, x, y):
+            render_size = max(cell, ctx.size_hints.get(args["cid"].lower(), 0))
+            return dict(
+                args,
+                render_size=render_size,
+                prebaked_path=prebaked_tiles.lookup(args, render_size),
+                canvas={"name": shm.name, "width": width, "cell": cell, "x": x, "y": y}
+            )
+
+        jobs, reused, waiting = [], [], []
+        owned = {}
+        owned_jobs = {}
+        for idx, (args, key) in enumerate(zip(work_args_list, keys)):
+            x, y = cell_position(layout, idx)
+            cached = local.get(key)
+            if cached is None:
+                cached = from_cache.get(key + (cell,))
+            if cached is not None:
+                reused.append((cached, x, y))
+            elif key in pending and key not in owned:
+                waiting.append((args, pending[key], x, y))
+            else:
+                job = job_for(args, x, y)
+                if key not in owned:
+                    owned[key] = pending[key] = asyncio.get_running_loop().create_future()
+                    owned_jobs[key] = job
+                jobs.append(job)
+
+        # Los tiles a mayor resolucion que la celda vuelven por memoria compartida, no por pickle.
+        oversized = [job for job in owned_jobs.values() if job["render_size"] > cell]
+        if oversized:
+            offset = 0
+            for job in oversized:
+                job["tile_out"] = {"offset": offset}
+                offset += job["render_size"] * job["render_size"] * 4
+            tiles_shm = shared_memory.SharedMemory(create=True, size=offset)
+            for job in oversized:
+                job["tile_out"]["name"] = tiles_shm.name
+
+        rendered = {}
+        try:
+            if jobs:
+                await render_pool.map(_render_into_canvas, jobs)
+                rendered = await run_blocking(_read_shared_tiles, shm, width, tiles_shm, owned_jobs)
+        finally:
+            for key, future in owned.items():
+                if pending.get(key) is future:
+                    del pending[key]
+                if key in rendered:
+                    tiles[key] = rendered[key]
+                if not future.done():
+                    future.set_result(rendered.get(key))
+
+        retry = []
+        for args, future, x, y in waiting:
+            tile = await future
+            if tile is None:
+                tile = tiles.get(_tile_key(args))
+            if tile is None or tile.width < cell:
+                retry.append(job_for(args, x, y))
+            else:
+                reused.append((tile, x, y))
+        if retry:
+            await render_pool.map(_render_into_canvas, retry)
+            jobs.extend(retry)
+
+        canvas, crops = await run_blocking(_compose_canvas, shm, layout, reused, jobs)
+    finally:
+        shm.close()
+        shm.unlink()
+        if tiles_shm is not None:
+            tiles_shm.close()
+            tiles_shm.unlink()
+
+    for key, tile in crops:
+        if key not in tiles or tiles[key].width < cell:
+            tiles[key] = tile
+    await run_blocking(
+        tile_cache.put_many,
+        [(key + (cell,), tile) for key, tile in crops if _tile_cacheable(key)]
+        + [(key + (tile.width,), tile) for key, tile in rendered.items() if tile.width > cell and _tile_cacheable(key)]
+    )
+
+    return canvas, layout
+
+def _encode_png(img: Image.Image) -> io.BytesIO:
+    f = io.BytesIO()
+    img.save(f, "PNG")
+    f.seek(0)
+    return f
+
 async def createimg(
     ids: list,
     session: aiohttp.ClientSession,
@@ -1061,182 +2978,122 @@ async def createimg(
     locker_data=None,
     exclusive_cosmetics=None,
     discord_user_id: int = None,
-    for_discord: bool = True
+    for_discord: bool = True,
+    *,
+    ctx: CheckContext
 ):
     logger.info(f"Creating image for {username} with {len(ids)} items")
 
-    if not os.path.exists('./cache'):
-        os.makedirs('./cache')
-
     await download_cosmetic_images(ids, session)
 
-    user_config = load_user_config(discord_user_id)
+    user_config = await run_blocking(load_user_config, discord_user_id)
     rarity_version = user_config.get("rarity_version", "v2")
     custom_link    = user_config.get("custom_link", "discord.gg/reno")
 
-    version_map = {
-        "v1": rarity_backgroundsV1,
-        "v2": rarity_backgroundsV2,
-        "v3": rarity_backgroundsV3,
-        "v4": rarity_backgroundsV4,
-        "v5": rarity_backgroundsV5,
-        "v6": rarity_backgroundsV6,
-        "v7": rarity_backgroundsV7,
-    }
-    backgrounds_to_use = version_map.get(rarity_version, rarity_backgroundsV2)
+    backgrounds_to_use = rarity_version_map.get(rarity_version, rarity_backgroundsV2)
 
     user_dir  = os.path.join(USER_CONFIG_FOLDER, str(discord_user_id))
     logo_path = os.path.join(user_dir, "logo.png")
-    if os.path.exists(logo_path):
+    if await run_blocking(os.path.exists, logo_path):
         logo_filename = logo_path
     else:
         logo_filename = os.path.join(current_dir, "logo.png")
 
-    cosmetic_info_tasks = [get_cosmetic_info(cid, session) for cid in ids]
-    results = await asyncio.gather(*cosmetic_info_tasks)
+    results = await ctx.resolve(ids, session)
+    converted_ids = ctx.converted_mythic_ids
 
-    info_list = []
-    global converted_mythic_ids
+    known = []
     for cosmetic_found in results:
         if cosmetic_found['name'].strip().lower() == "unknown":
             logger.info(f"Descartado ítem {cosmetic_found['id']} por tener nombre 'Unknown'.")
             continue
+        known.append(cosmetic_found)
 
-        cid_lower = cosmetic_found['id'].lower()
-        make_mythic = False
-
-        if locker_data and exclusive_cosmetics:
-            if cosmetic_found['id'].upper() in exclusive_cosmetics:
-                if cid_lower == 'cid_028_athena_commando_f':
-                    if 'Mat3' in locker_data['unlocked_styles'].get('cid_028_athena_commando_f', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "OG Renegade Raider"
-                    else:
-                        cosmetic_found['name'] = "Renegade Raider (NO OG)"
-
-                if cid_lower == 'cid_017_athena_commando_m':
-                    if 'Stage2' in locker_data['unlocked_styles'].get('cid_017_athena_commando_m', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "OG Aerial Assault Trooper"
-                    else:
-                        cosmetic_found['name'] = "Aerial Assault Trooper (NO OG)"
-
-                if cid_lower == 'cid_547_athena_commando_f_meteorwoman':
-                    if 'Stage2' in locker_data['unlocked_styles'].get('cid_547_athena_commando_f_meteorwoman', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "OG Paradigm"
-                    else:
-                        cosmetic_found['name'] = "Normal Paradigm"
-
-                if cid_lower == 'cid_029_athena_commando_f_halloween':
-                    if 'Mat3' in locker_data['unlocked_styles'].get('cid_029_athena_commando_f_halloween', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "OG Ghoul Trooper"
-                    else:
-                        cosmetic_found['name'] = "Ghoul Trooper (NO OG)"
-
-                if cid_lower == 'cid_116_athena_commando_m_carbideblack':
-                    if 'Stage4' in locker_data['unlocked_styles'].get('cid_116_athena_commando_m_carbideblack', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "Omega Luces"
-                    else:
-                        cosmetic_found['name'] = "Omega"
-
-                if cid_lower == 'cid_315_athena_commando_m_teriyakifish':
-                    if 'Stage3' in locker_data['unlocked_styles'].get('cid_315_athena_commando_m_teriyakifish', []):
-                        make_mythic = True
-                        cosmetic_found['name'] = "Fishstick World Cup"
-                    else:
-                        cosmetic_found['name'] = "Fishstick Normal"
-
-        if cid_lower == 'cid_030_athena_commando_m_halloween':
-            if locker_data and 'Mat1' in locker_data['unlocked_styles'].get('cid_030_athena_commando_m_halloween', []):
-                make_mythic = True
-                cosmetic_found['name'] = "OG Skull Trooper"
-            else:
-                cosmetic_found['name'] = "Skull Trooper (NO OG)"
-
-        if cid_lower in [m.lower() for m in mythic_ids]:
-            make_mythic = True
-
-        if make_mythic:
-            cosmetic_found['rarity'] = 'Mythic'
-            converted_mythic_ids.append(cosmetic_found['id'])
-
-        info_list.append(cosmetic_found)
-
-    def find_substitute_url(cosmetic, locker_d):
-        substitution_map = {
-            'cid_029_athena_commando_f_halloween': {'mat3':  "./Estilos/Ghoul.png"},
-            'cid_315_athena_commando_m_teriyakifish': {'stage3': "./Estilos/Fishy.png"},
-            'cid_030_athena_commando_m_halloween':    {'mat1':  "./Estilos/Skull.png"},
-            'cid_017_athena_commando_m':             {'stage3': "./Estilos/Asaltante.png"},
-            'cid_547_athena_commando_f_meteorwoman': {'mat3':  "./Estilos/Para.png"},
-            'cid_028_athena_commando_f':             {'mat3':  "./Estilos/Renegade.png"},
-            'cid_116_athena_commando_m_carbideblack':{'stage5': "./Estilos/Omega.png"},
-        }
-        cid_lower = cosmetic["id"].lower()
-        if not locker_d:
-            return None
-        if cid_lower not in substitution_map:
-            return None
-        styles = locker_d.get('unlocked_styles', {}).get(cosmetic["id"], [])
-        for style in styles:
-            style_lower = style.lower()
-            if style_lower in substitution_map[cid_lower]:
-                return substitution_map[cid_lower][style_lower]
-        return None
+    info_list = []
     work_args_list = []
-    for cosmetic in info_list:
+    for cosmetic, make_mythic, sub_url in cosmetic_rules.classify(known, locker_data, exclusive_cosmetics):
+        if make_mythic and cosmetic['id'] not in converted_ids:
+            converted_ids.append(cosmetic['id'])
+        info_list.append(cosmetic)
+
         rarity = cosmetic.get("rarity", "Common")
         background_path = backgrounds_to_use.get(rarity, backgrounds_to_use["Common"])
-        sub_url = find_substitute_url(cosmetic, locker_data)
-
+        digest = icon_store.digest_for(cosmetic["id"])
         work_args = {
             "cid": cosmetic["id"],
             "name": cosmetic["name"],
             "rarity": rarity,
             "background_path": background_path,
             "substitute_image_url": sub_url,
+            "rarity_version": rarity_version,
+            "icon_path": icon_store.path_for(cosmetic["id"]),
+            "icon_digest": digest,
+            "icon_levels": icon_store.mipmap_levels(digest) if digest else [],
         }
         work_args_list.append(work_args)
 
-    images = []
-    if work_args_list:
-        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
-            for final_img in executor.map(_process_cosmetic_item, work_args_list):
-                images.append(final_img)
-
-    if images:
-        if sort_by_rarity_flag:
-            sorted_pairs = sorted(
-                zip(info_list, images),
-                key=lambda x: rarity_priority.get(x[0]["rarity"], 999)
-            )
-            sorted_images = [img for _, img in sorted_pairs]
-        elif item_order:
-            sorted_pairs = sorted(
-                zip(info_list, images),
-                key=lambda x: item_order.index(get_cosmetic_type(x[0]["id"]))
-                    if get_cosmetic_type(x[0]["id"]) in item_order
-                    else len(item_order)
+    if sort_by_rarity_flag:
+        order_idx = sorted(range(len(info_list)), key=lambda i: rarity_priority.get(info_list[i]["rarity"], 999))
+    elif item_order:
+        type_ranks = rank_cosmetic_types([info["id"] for info in info_list], item_order)
+        order_idx = sorted(range(len(info_list)), key=type_ranks.__getitem__)
+    else:
+        order_idx = range(len(info_list))
+    ordered_args = [work_args_list[i] for i in order_idx]
+
+    tiles = ctx.tiles
+
+    if ordered_args:
+        if RENDER_SHARED_CANVAS:
+            combined_image, layout = await render_shared_canvas(ordered_args, ctx)
+            await run_blocking(
+                draw_footer,
+                combined_image,
+                layout,
+                username,
+                len(info_list),
+                logo_filename=logo_filename,
+                custom_link=custom_link
             )
-            sorted_images = [img for _, img in sorted_pairs]
         else:
-            sorted_images = images
-
-        combined_image = combine_images(
-            sorted_images,
-            username,
-            len(info_list),
-            logo_filename=logo_filename,
-            custom_link=custom_link
-        )
+            missing = [key for key in dict.fromkeys(map(_tile_key, ordered_args)) if key not in tiles and _tile_cacheable(key)]
+            cached = await run_blocking(tile_cache.get_many, [key + ("full",) for key in missing])
+            pending = []
+            for args in ordered_args:
+                key = _tile_key(args)
+                if key in tiles:
+                    continue
+                if key + ("full",) in cached:
+                    tiles[key] = cached[key + ("full",)]
+                else:
+                    pending.append(args)
+            if pending:
+                rendered = await render_pool.map(_process_cosmetic_item, pending)
+                for args, final_img in zip(pending, rendered):
+                    tiles[_tile_key(args)] = final_img
+                await run_blocking(
+                    tile_cache.put_many,
+                    [
+                        (_tile_key(args) + ("full",), final_img)
+                        for args, final_img in zip(pending, rendered) if _tile_cacheable(_tile_key(args))
+                    ]
+                )
+            combined_image = await run_blocking(
+                combine_images,
+                [tiles[_tile_key(a)] for a in ordered_args],
+                username,
+                len(info_list),
+                logo_filename=logo_filename,
+                custom_link=custom_link
+            )
 
-        f = io.BytesIO()
-        combined_image.save(f, "PNG")
-        f.seek(0)
+        f = await run_blocking(_encode_png, combined_image)
         logger.info(f"Created final combined image for {username}")
+        logger.info(f"Single-flight stats: {single_flight.stats()}")
+        logger.info(f"Tile cache stats: {tile_cache.stats()}")
+        logger.info(f"HTTP client stats: {http_client.stats()}")
+        logger.info(f"fortnite-api scheduler stats: {fortnite_api.stats()}")
+        logger.info(f"fortnite-api CDN stats: {fortnite_cdn.stats()}")
 
         if for_discord:
             return f, "combined.png"
@@ -1249,6 +3106,44 @@ async def createimg(
         else:
             return None
 
+def _overlap(span: list, others: list) -> float:
+    return sum(max(0.0, min(span[1], end) - max(span[0], start)) for start, end in others)
+
+async def run_render_pipeline(stages: list, publish, label: str = ""):
+    t0 = time.perf_counter()
+    renders, uploads = {}, {}
+
+    async def _render(name, factory):
+        start = time.perf_counter() - t0
+        try:
+            return await factory()
+        finally:
+            renders[name] = [start, time.perf_counter() - t0]
+
+    tasks = [(name, asyncio.create_task(_render(name, factory))) for name, factory in stages]
+    try:
+        for name, task in tasks:
+            result = await task
+            start = time.perf_counter() - t0
+            await publish(name, result)
+            uploads[name] = [start, time.perf_counter() - t0]
+    except BaseException:
+        for _, task in tasks:
+            task.cancel()
+        raise
+
+    wall = time.perf_counter() - t0
+    upload_spans = list(uploads.values())
+    for name, _ in tasks:
+        render, upload = renders[name], uploads[name]
+        logger.info(
+            f"Pipeline {label} {name}: render {render[0]:.2f}-{render[1]:.2f}s, "
+            f"upload {upload[0]:.2f}-{upload[1]:.2f}s, "
+            f"{_overlap(render, upload_spans):.2f}s of render overlapped uploads"
+        )
+    sequential = sum(end - start for start, end in renders.values()) + sum(end - start for start, end in upload_spans)
+    logger.info(f"Pipeline {label}: {wall:.2f}s wall vs {sequential:.2f}s sequential ({sequential / wall:.1f}x overlap)")
+
 async def delete_friends(session: aiohttp.ClientSession, user: EpicUser):
     async with session.get(
         f"https://friends-public-service-prod.ol.epicgames.com/friends/api/public/friends/{user.account_id}",
@@ -1268,6 +3163,293 @@ async def delete_friends(session: aiohttp.ClientSession, user: EpicUser):
                 logger.warning(f"Error deleting friend {friend['accountId']} ({r2.status})")
 
 
+class RenderRejected(Exception):
+    pass
+
+class RenderTicket:
+    def __init__(self, scheduler: "RenderScheduler", user_id: int):
+        self.scheduler = scheduler
+        self.user_id = user_id
+        self.rendered = False
+        self.closed = False
+
+    def slot(self, on_position=None):
+        return self.scheduler._slot(self, on_position)
+
+    def close(self):
+        self.scheduler._close(self)
+
+class RenderScheduler:
+    def __init__(self, max_concurrent: int = RENDER_MAX_CONCURRENT, queue_limit: int = RENDER_QUEUE_LIMIT,
+                 user_limit: int = RENDER_USER_LIMIT, cooldown: float = RENDER_USER_COOLDOWN):
+        self.max_concurrent = max_concurrent
+        self.queue_limit = queue_limit
+        self.user_limit = user_limit
+        self.cooldown = cooldown
+        self._active = 0
+        self._queues = OrderedDict()
+        self._open = {}
+        self._last_finished = {}
+        self.counters = {"admitted": 0, "rejected": 0, "completed": 0, "max_wait_s": 0.0}
+
+    def admit(self, user_id: int) -> RenderTicket:
+        remaining = self.cooldown - (time.monotonic() - self._last_finished.get(user_id, float("-inf")))
+        if remaining > 0:
+            reason = f"`⏳` Please wait {math.ceil(remaining)}s before starting another check."
+        elif self._open.get(user_id, 0) >= self.user_limit:
+            reason = "`⏳` You already have a check in progress. Please wait until it finishes."
+        else:
+            reason = None
+        if reason:
+            self.counters["rejected"] += 1
+            logger.info(f"Render rechazado para {user_id}: {reason}")
+            raise RenderRejected(reason)
+        self._open[user_id] = self._open.get(user_id, 0) + 1
+        self.counters["admitted"] += 1
+        return RenderTicket(self, user_id)
+
+    def _close(self, ticket: RenderTicket):
+        if ticket.closed:
+            return
+        ticket.closed = True
+        count = self._open.get(ticket.user_id, 0) - 1
+        if count > 0:
+            self._open[ticket.user_id] = count
+        else:
+            self._open.pop(ticket.user_id, None)
+        if ticket.rendered:
+            self._last_finished[ticket.user_id] = time.monotonic()
+
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def position(self, future) -> int:
+        queues = [list(q) for q in self._queues.values()]
+        position = 0
+        for depth in range(max((len(q) for q in queues), default=0)):
+            for q in queues:
+                if depth < len(q):
+                    position += 1
+                    if q[depth] is future:
+                        return position
+        return 0
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def _release(self):
+        self._active -= 1
+        self.counters["completed"] += 1
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, ticket: RenderTicket, on_position=None):
+        # La capacidad se mide al pedir el render: quien sigue en el login por device code no ocupa sitio.
+        if self._active + self.waiting() >= self.max_concurrent + self.queue_limit:
+            reason = "`🚦` The checker is at full capacity right now. Please try again in a minute."
+            self.counters["rejected"] += 1
+            logger.info(f"Render rechazado para {ticket.user_id}: {reason}")
+            raise RenderRejected(reason)
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(ticket.user_id, deque()).append(future)
+        queued_at = time.monotonic()
+        self._dispatch()
+        last_position = None
+        try:
+            while not future.done():
+                position = self.position(future)
+                if on_position is not None and position != last_position:
+                    last_position = position
+                    await on_position(position)
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=RENDER_QUEUE_UPDATE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                queue = self._queues.get(ticket.user_id)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._queues[ticket.user_id]
+            raise
+        try:
+            waited = time.monotonic() - queued_at
+            self.counters["max_wait_s"] = max(self.counters["max_wait_s"], round(waited, 2))
+            if last_position is not None:
+                logger.info(f"Render de {ticket.user_id} arrancó tras {waited:.1f}s en cola.")
+                if on_position is not None:
+                    await on_position(None)
+            ticket.rendered = True
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return dict(self.counters, active=self._active, waiting=self.waiting(), open=sum(self._open.values()))
+
+render_scheduler = RenderScheduler()
+
+def queue_position_updater(interaction: discord.Interaction, message_id: int, embed: Embed):
+    async def _update(position):
+        if position is None:
+            queued_embed = embed
+        else:
+            queued_embed = embed.copy()
+            queued_embed.add_field(
+                name="`⏳` **Queued**",
+                value=f"Your images are waiting for a render slot: position **{position}** in queue.",
+                inline=False
+            )
+        try:
+            await interaction.followup.edit_message(message_id=message_id, embed=queued_embed)
+        except discord.HTTPException as e:
+            logger.warning(f"No se pudo actualizar la posición en cola: {e}")
+    return _update
+
+COMMAND_TASK_NAMES = frozenset({"login_task", "todo_task", "launch_task", "eliminar_amigos_task"})
+
+current_command = contextvars.ContextVar("current_command", default=None)
+_task_commands = weakref.WeakKeyDictionary()
+
+def start_command_task(coro) -> asyncio.Task:
+    context = contextvars.copy_context()
+    context.run(current_command.set, coro.__name__)
+    return asyncio.create_task(coro, context=context)
+
+def _command_task_factory(loop, coro, context=None):
+    # Python 3.11 no expone Task.get_context(): anotamos el comando al crear la tarea para el watchdog.
+    if context is None:
+        context = contextvars.copy_context()
+    task = asyncio.Task(coro, loop=loop, context=context)
+    command = context.get(current_command)
+    if command is not None:
+        _task_commands[task] = command
+    return task
+
+def _command_from_stack(frame) -> str:
+    command = None
+    while frame is not None:
+        name = frame.f_code.co_name
+        if name in COMMAND_TASK_NAMES or name.endswith("_command"):
+            command = name
+        frame = frame.f_back
+    return command
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, stall_threshold: float = LOOP_STALL_THRESHOLD,
+                 samples: int = LOOP_LAG_SAMPLES):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.samples = deque(maxlen=samples)
+        self.stalls = 0
+        self._over_budget = []
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._loop = None
+        self._task = None
+        self._report_task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    async def _sample_loop(self):
+        while True:
+            start = time.monotonic()
+            self._heartbeat = start
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self._record(max(0.0, now - start - self.interval))
+
+    def _record(self, lag: float):
+        self.samples.append(lag)
+        if lag > LOOP_BLOCK_BUDGET:
+            self._over_budget.append(lag)
+            return
+        if self._over_budget:
+            # Una sola linea por tramo seguido fuera de presupuesto; el detalle queda en el informe p50/p95/p99.
+            over, self._over_budget = self._over_budget, []
+            logger.warning(
+                f"Event loop bloqueado en {len(over)} muestras seguidas "
+                f"(max {max(over) * 1000:.0f} ms, total {sum(over) * 1000:.0f} ms, presupuesto {LOOP_BLOCK_BUDGET * 1000:.0f} ms)"
+            )
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(LOOP_LAG_REPORT_INTERVAL)
+            logger.info(f"Event loop lag: {self.stats()}")
+            logger.info(f"Render scheduler: {render_scheduler.stats()}")
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            if stalled_for < self.stall_threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self._loop)
+            command = (_task_commands.get(task) if task is not None else None) or _command_from_stack(frame) or "desconocido"
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"Event loop parado {stalled_for * 1000:.0f} ms (comando: {command}). Stack:\n{stack}"
+            )
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
+        self._loop.set_task_factory(_command_task_factory)
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample_loop())
+        self._report_task = asyncio.create_task(self._report_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        for task in (self._task, self._report_task):
+            if task is not None:
+                task.cancel()
+
+    def stats(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0, "stalls": self.stalls}
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+        return {
+            "samples": len(ordered),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(ordered[-1] * 1000, 1),
+            "stalls": self.stalls,
+        }
+
+loop_monitor = LoopMonitor()
+
 class MyBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -1277,8 +3459,30 @@ class MyBot(commands.Bot):
         super().__init__(command_prefix='!', intents=intents)
 
     async def setup_hook(self):
+        if os.environ.get("BOT_LOOP_DEBUG"):
+            loop = asyncio.get_running_loop()
+            loop.set_debug(True)
+            loop.slow_callback_duration = LOOP_BLOCK_BUDGET
+        loop_monitor.start()
+        await run_blocking(get_cosmetic_store)
+        if not await run_blocking(cosmetic_catalog.load_store):
+            await run_blocking(cosmetic_catalog.load_snapshot)
+        cosmetic_catalog.start_background_refresh()
+        await run_blocking(rarity_assets.validate)
+        await run_blocking(prebaked_tiles.load)
+        await run_blocking(icon_store.load)
+        await run_blocking(negative_cache.load)
+        render_pool.start()
+        render_pool.start_health_checks()
         await self.tree.sync()
 
+    async def close(self):
+        loop_monitor.stop()
+        logger.info(f"Event loop lag: {loop_monitor.stats()}")
+        render_pool.shutdown()
+        await http_client.close()
+        await super().close()
+
 bot = MyBot()
 
 async def send_start_menu(interaction_or_channel):
@@ -1333,12 +3537,15 @@ async def help_command(interaction: discord.Interaction):
 
 @app_commands.command(name="login", description="Login to your Fortnite account.")
 async def login_command(interaction: discord.Interaction):
+    try:
+        ticket = render_scheduler.admit(interaction.user.id)
+    except RenderRejected as e:
+        await interaction.response.send_message(embed=Embed(description=str(e), color=0x2F3136), ephemeral=True)
+        return
     await interaction.response.defer()
-    asyncio.create_task(login_task(interaction))
+    start_command_task(login_task(interaction, ticket))
 
-async def login_task(interaction: discord.Interaction):
-    global converted_mythic_ids
-    converted_mythic_ids = []
+async def login_task(interaction: discord.Interaction, ticket: RenderTicket):
     try:
         logger.info("Iniciando tarea de login (Discord)")
 
@@ -1366,7 +3573,7 @@ async def login_task(interaction: discord.Interaction):
         )
         await interaction.followup.edit_message(message_id=msg.id, embed=embed_success, view=None)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client as session:
             set_affiliate_response = await set_affiliate(session, user.account_id, user.access_token, "King")
             if isinstance(set_affiliate_response, str) and 'Error' in set_affiliate_response:
                 await interaction.followup.send(embed=Embed(
@@ -1375,15 +3582,13 @@ async def login_task(interaction: discord.Interaction):
                 ))
                 return
 
-            verification_counts = load_verification_counts()
             discord_user_id   = str(interaction.user.id)
             discord_username  = interaction.user.display_name
 
-            verification_counts[discord_user_id] = verification_counts.get(discord_user_id, 0) + 1
-            save_verification_counts(verification_counts)
+            verification_count = await run_blocking(increment_verification_count, discord_user_id)
 
             await send_webhook_message(
-                f"Discord user {discord_username} has verified their account {verification_counts[discord_user_id]} times."
+                f"Discord user {discord_username} has verified their account {verification_count} times."
             )
 
             account_info = await get_account_info(session, user)
@@ -1479,27 +3684,10 @@ async def login_task(interaction: discord.Interaction):
 
             username = interaction.user.display_name
 
-            locker_data = {'unlocked_styles': {}}
-            athena_data = profile
-            for item_id, item_data in athena_data['profileChanges'][0]['profile']['items'].items():
-                template_id = item_data.get('templateId', '')
-                if template_id.startswith('Athena'):
-                    lowercase_cosmetic_id = template_id.split(':')[1]
-                    if lowercase_cosmetic_id not in locker_data['unlocked_styles']:
-                        locker_data['unlocked_styles'][lowercase_cosmetic_id] = []
-                    variants = item_data.get('attributes', {}).get('variants', [])
-                    for variant in variants:
-                        locker_data['unlocked_styles'][lowercase_cosmetic_id].extend(variant.get('owned', []))
-
-            exclusive_cosmetics = [
-                'CID_017_ATHENA_COMMANDO_M',
-                'CID_028_ATHENA_COMMANDO_F',
-                'CID_029_ATHENA_COMMANDO_F_HALLOWEEN',
-                'CID_030_ATHENA_COMMANDO_M_HALLOWEEN',
-                'CID_116_ATHENA_COMMANDO_M_CARBIDEBLACK',
-                'CID_315_ATHENA_COMMANDO_M_TERIYAKIFISH',
-                'CID_547_ATHENA_COMMANDO_F_METEORWOMAN',
-            ]
+            locker_data = parse_unlocked_styles(profile)
+
+            exclusive_cosmetics = cosmetic_rules.exclusive_cosmetics
+            ctx = CheckContext(locker_data, exclusive_cosmetics)
 
             items = {}
             for it_data in profile['profileChanges'][0]['profile']['items'].values():
@@ -1518,34 +3706,27 @@ async def login_task(interaction: discord.Interaction):
 
             order = ["Skins", "Backpacks", "Pickaxe", "Emotes", "Gliders", "Banners"]
 
-            for group in order:
-                if group in items:
-                    sorted_ids = await sort_ids_by_rarity(items[group], session, item_order=order)
-                    image_data, filename = await createimg(
-                        sorted_ids,
-                        session,
-                        username=username,
-                        sort_by_rarity_flag=True,
-                        item_order=order,
-                        locker_data=locker_data,
-                        exclusive_cosmetics=exclusive_cosmetics,
-                        discord_user_id=interaction.user.id,
-                        for_discord=True
-                    )
-                    if image_data and filename:
-                        file  = discord.File(fp=image_data, filename=filename)
-                        embed = Embed(title=f"**{group}**", color=0x2F3136)
-                        embed.set_image(url=f"attachment://{filename}")
-                        await interaction.followup.send(embed=embed, file=file)
+            await ctx.classify([cid for group in order for cid in items.get(group, [])], session)
+            mythic_items = filter_mythic_ids_func(items, ctx)
 
-            mythic_items = filter_mythic_ids_func(items, converted_mythic_ids)
-            if mythic_items:
-                sorted_mythic_items = await sort_ids_by_rarity(mythic_items, session, item_order=order)
+            async def render_group(group):
+                sorted_ids = await sort_ids_by_rarity(items[group], session, item_order=order, ctx=ctx)
+                return await createimg(
+                    sorted_ids,
+                    session,
+                    username=username,
+                    sort_by_rarity_flag=True,
+                    item_order=order,
+                    locker_data=locker_data,
+                    exclusive_cosmetics=exclusive_cosmetics,
+                    discord_user_id=interaction.user.id,
+                    for_discord=True,
+                    ctx=ctx
+                )
 
-                mythic_cosmetics_info = []
-                for cid in sorted_mythic_items:
-                    info = await get_cosmetic_info(cid, session)
-                    mythic_cosmetics_info.append(info)
+            async def render_mythic():
+                sorted_mythic_items = await sort_ids_by_rarity(mythic_items, session, item_order=order, ctx=ctx)
+                mythic_cosmetics_info = await ctx.resolve(sorted_mythic_items, session)
 
                 num_skins_totales = len(items.get("Skins", []))
                 nombres_miticos  = " | ".join([c["name"] for c in mythic_cosmetics_info])
@@ -1561,32 +3742,66 @@ async def login_task(interaction: discord.Interaction):
                     locker_data=locker_data,
                     exclusive_cosmetics=exclusive_cosmetics,
                     discord_user_id=interaction.user.id,
-                    for_discord=True
+                    for_discord=True,
+                    ctx=ctx
                 )
+                return mythic_image_data, mythic_filename, descripcion
+
+            async def publish(name, result):
+                if name == "Mythical Things":
+                    mythic_image_data, mythic_filename, descripcion = result
+                    if mythic_image_data and mythic_filename:
+                        file  = discord.File(fp=mythic_image_data, filename=mythic_filename)
+                        embed = Embed(
+                            title="**Mythical Things**",
+                            description=descripcion,
+                            color=0xffd700
+                        )
+                        embed.set_image(url=f"attachment://{mythic_filename}")
 
-                if mythic_image_data and mythic_filename:
-                    file  = discord.File(fp=mythic_image_data, filename=mythic_filename)
-                    embed = Embed(
-                        title="**Mythical Things**",
-                        description=descripcion,     
-                        color=0xffd700
-                    )
-                    embed.set_image(url=f"attachment://{mythic_filename}")
+                        await interaction.followup.send(embed=embed, file=file)
+                    return
 
+                image_data, filename = result
+                if image_data and filename:
+                    file  = discord.File(fp=image_data, filename=filename)
+                    embed = Embed(title=f"**{name}**", color=0x2F3136)
+                    embed.set_image(url=f"attachment://{filename}")
                     await interaction.followup.send(embed=embed, file=file)
 
+            stages = []
+            for group in order:
+                if group in items:
+                    ctx.plan_image(items[group])
+                    stages.append((group, functools.partial(render_group, group)))
+            if mythic_items:
+                ctx.plan_image(mythic_items)
+                stages.append(("Mythical Things", render_mythic))
+            async with ticket.slot(queue_position_updater(interaction, msg.id, embed_success)):
+                await run_render_pipeline(stages, publish, label=username)
+
+            logger.info(f"Check for {username} resolved {ctx.lookups} cosmetic lookups for {len(ctx.info)} items.")
             await interaction.followup.send("Thank you for verifying your account! 🙏")
 
+    except RenderRejected as e:
+        await interaction.followup.send(embed=Embed(description=str(e), color=0x2F3136))
     except Exception as e:
         await interaction.followup.send(embed=Embed(description=f"`⚠️` Error: {e}", color=0x2F3136))
         logger.error(f"Error en login_task (Discord): {e}")
+    finally:
+        ticket.close()
 
 @app_commands.command(name="bulk", description="Get an image with ALL the cosmetics in your account.")
 async def todo_command(interaction: discord.Interaction):
+    try:
+        ticket = render_scheduler.admit(interaction.user.id)
+    except RenderRejected as e:
+        await interaction.response.send_message(embed=Embed(description=str(e), color=0x2F3136), ephemeral=True)
+        return
     await interaction.response.defer()
-    asyncio.create_task(todo_task(interaction))
+    start_command_task(todo_task(interaction, ticket))
 
-async def todo_task(interaction: discord.Interaction):
+async def todo_task(interaction: discord.Interaction, ticket: RenderTicket):
     try:
         logger.info("Iniciando tarea de /todo (Todos los cosméticos)")
 
@@ -1614,7 +3829,7 @@ async def todo_task(interaction: discord.Interaction):
         )
         await interaction.followup.edit_message(message_id=msg.id, embed=embed_success, view=None)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client as session:
             profile = await grabprofile(
                 session,
                 {"account_id": user.account_id, "access_token": user.access_token},
@@ -1623,27 +3838,10 @@ async def todo_task(interaction: discord.Interaction):
             if isinstance(profile, str):
                 await interaction.followup.send(embed=Embed(description=profile, color=0xff0000))
                 return
-            locker_data = {'unlocked_styles': {}}
-            athena_data = profile
-            for item_id, item_data in athena_data['profileChanges'][0]['profile']['items'].items():
-                template_id = item_data.get('templateId', '')
-                if template_id.startswith('Athena'):
-                    lowercase_cosmetic_id = template_id.split(':')[1]
-                    if lowercase_cosmetic_id not in locker_data['unlocked_styles']:
-                        locker_data['unlocked_styles'][lowercase_cosmetic_id] = []
-                    variants = item_data.get('attributes', {}).get('variants', [])
-                    for variant in variants:
-                        locker_data['unlocked_styles'][lowercase_cosmetic_id].extend(variant.get('owned', []))
-
-            exclusive_cosmetics = [
-                'CID_017_ATHENA_COMMANDO_M',
-                'CID_028_ATHENA_COMMANDO_F',
-                'CID_029_ATHENA_COMMANDO_F_HALLOWEEN',
-                'CID_030_ATHENA_COMMANDO_M_HALLOWEEN',
-                'CID_116_ATHENA_COMMANDO_M_CARBIDEBLACK',
-                'CID_315_ATHENA_COMMANDO_M_TERIYAKIFISH',
-                'CID_547_ATHENA_COMMANDO_F_METEORWOMAN',
-            ]
+            locker_data = parse_unlocked_styles(profile)
+
+            exclusive_cosmetics = cosmetic_rules.exclusive_cosmetics
+            ctx = CheckContext(locker_data, exclusive_cosmetics)
             items = {}
             for it_data in profile['profileChanges'][0]['profile']['items'].values():
                 tid = it_data['templateId'].lower()
@@ -1667,20 +3865,22 @@ async def todo_task(interaction: discord.Interaction):
                     combined_images.extend(items[group])
 
             if combined_images:
-                sorted_all = await sort_ids_by_rarity(combined_images, session, item_order=order)
+                sorted_all = await sort_ids_by_rarity(combined_images, session, item_order=order, ctx=ctx)
                 username   = interaction.user.display_name
-                combined_image_data, combined_filename = await createimg(
-                    sorted_all,
-                    session,
-                    "Todos los Cosméticos",
-                    username,
-                    sort_by_rarity_flag=False,
-                    item_order=order,
-                    locker_data=locker_data,
-                    exclusive_cosmetics=exclusive_cosmetics,
-                    discord_user_id=interaction.user.id,
-                    for_discord=True
-                )
+                async with ticket.slot(queue_position_updater(interaction, msg.id, embed_success)):
+                    combined_image_data, combined_filename = await createimg(
+                        sorted_all,
+                        session,
+                        "Todos los Cosméticos",
+                        username,
+                        sort_by_rarity_flag=False,
+                        item_order=order,
+                        locker_data=locker_data,
+                        exclusive_cosmetics=exclusive_cosmetics,
+                        discord_user_id=interaction.user.id,
+                        for_discord=True,
+                        ctx=ctx
+                    )
                 if combined_image_data and combined_filename:
                     file  = discord.File(fp=combined_image_data, filename=combined_filename)
                     embed = Embed(title="**All Cosmetics**", color=0x0000ff)
@@ -1689,14 +3889,18 @@ async def todo_task(interaction: discord.Interaction):
             else:
                 await interaction.followup.send("No cosmetics were found on this account.")
     
+    except RenderRejected as e:
+        await interaction.followup.send(embed=Embed(description=str(e), color=0x2F3136))
     except Exception as e:
         await interaction.followup.send(embed=Embed(description=f"⚠️ Error: {e}", color=0xff0000))
         logger.error(f"Error en todo_task: {e}")
+    finally:
+        ticket.close()
 
 @app_commands.command(name="launch", description="Launch Fortnite with the bot.")
 async def launch_command(interaction: discord.Interaction):
     await interaction.response.defer()
-    asyncio.create_task(launch_task(interaction))
+    start_command_task(launch_task(interaction))
 
 async def launch_task(interaction: discord.Interaction):
     try:
@@ -1738,7 +3942,7 @@ async def launch_task(interaction: discord.Interaction):
 @app_commands.command(name="clearfriends", description="Clear your friend list.")
 async def eliminar_amigos_command(interaction: discord.Interaction):
     await interaction.response.defer()
-    asyncio.create_task(eliminar_amigos_task(interaction))
+    start_command_task(eliminar_amigos_task(interaction))
 
 async def eliminar_amigos_task(interaction: discord.Interaction):
     try:
@@ -1756,7 +3960,7 @@ async def eliminar_amigos_task(interaction: discord.Interaction):
 
         user = await epic_generator.wait_for_device_code_completion(device_code)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client as session:
             await delete_friends(session, user)
 
         embed_success = Embed(
@@ -1822,9 +4026,7 @@ class VersionChangeView(View):
             await interaction.response.send_message("You cannot use this button.", ephemeral=True)
             return
         version, _ = image_paths[self.current_index]
-        config = load_user_config(self.user_id)
-        config["rarity_version"] = version.lower()
-        save_user_config(self.user_id, config)
+        await run_blocking(update_user_config, self.user_id, rarity_version=version.lower())
 
         await interaction.response.send_message(
             f"✅ You have selected **Version {version.upper()}**. Future images will use this version..",
@@ -1888,12 +4090,9 @@ async def resetear_command(interaction: discord.Interaction):
     default_text = "discord.gg/reno"
 
     try:
-        config = load_user_config(user_id)
-        config["custom_link"] = default_text
-        save_user_config(user_id, config)
+        await run_blocking(update_user_config, user_id, custom_link=default_text)
 
-        if os.path.exists(logo_path):
-            os.remove(logo_path)
+        if await run_blocking(_remove_if_exists, logo_path):
             logo_message = "Custom logo removed. Default will be used."
         else:
             logo_message = "You didn't have a custom logo. The default one will be used."
@@ -1914,6 +4113,17 @@ async def resetear_command(interaction: discord.Interaction):
             color=0xff0000
         ))
 
+def _verify_image(path: str):
+    with Image.open(path) as img:
+        img.verify()
+
+def _remove_if_exists(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
 @bot.event
 async def on_message(message: discord.Message):
     if message.author.bot:
@@ -1927,17 +4137,15 @@ async def on_message(message: discord.Message):
             if any(attachment.filename.lower().endswith(ext) for ext in ['png','jpg','jpeg','gif']):
                 try:
                     user_dir = os.path.join(USER_CONFIG_FOLDER, str(user_id))
-                    os.makedirs(user_dir, exist_ok=True)
                     logo_path = os.path.join(user_dir, "logo.png")
+                    await run_blocking(os.makedirs, user_dir, exist_ok=True)
                     await attachment.save(logo_path)
-                    with Image.open(logo_path) as img:
-                        img.verify()
+                    await run_blocking(_verify_image, logo_path)
 
                     await message.channel.send("✅ Logo successfully updated.")
                 except UnidentifiedImageError:
                     await message.channel.send("⚠️ The uploaded file is not a valid image.")
-                    if os.path.exists(logo_path):
-                        os.remove(logo_path)
+                    await run_blocking(_remove_if_exists, logo_path)
                 except Exception as e:
                     logger.error(f"Error al procesar el logo: {e}")
                     await message.channel.send("⚠️ An error occurred while processing the image.")
@@ -1957,9 +4165,7 @@ async def on_message(message: discord.Message):
             await message.channel.send("⚠️ The text is too long (max 32).")
         else:
             try:
-                config = load_user_config(user_id)
-                config["custom_link"] = new_text
-                save_user_config(user_id, config)
+                await run_blocking(update_user_config, user_id, custom_link=new_text)
                 await message.channel.send("✅ Updated custom text.")
             except Exception as e:
                 logger.error(f"Error al actualizar link: {e}")
@@ -1,38 +1,167 @@
-import aiohttp
-import asyncio
 import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
 
-if not os.path.exists('cache'):
-    os.makedirs('cache')
+from bot import icon_store, negative_cache, atomic_write
+
+MANIFEST_FILE = os.path.join("cache", "descargar_manifest.json")
+MANIFEST_FLUSH_EVERY = 100
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
 
 def read_skin_ids(file_path):
     with open(file_path, 'r') as file:
         return [line.strip() for line in file if line.strip()]
 
-async def download_image(session, id):
-    imgpath = f"./cache/{id}.png"
-    if not os.path.exists(imgpath) or not os.path.isfile(imgpath):
-        urls = [
-            f"https://fortnite-api.com/images/cosmetics/br/{id}/icon.png",
-            f"https://fortnite-api.com/images/cosmetics/br/{id}/smallicon.png"
-        ]
-        for url in urls:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    with open(imgpath, "wb") as f:
-                        f.write(await resp.read())
-                    print(f"Imagen descargada: {imgpath}")
-                    break
-        else:
-            with open(imgpath, "wb") as f:
-                f.write(open("tbd.png", "rb").read())
-            print(f"Image is missing {id}, usando imagen por defecto.")
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Manifest ilegible ({e}), se empieza de cero.")
+        return {}
+
+def save_manifest(path, manifest):
+    atomic_write(path, json.dumps(manifest).encode('utf-8'))
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+class Warmer:
+    def __init__(self, session, concurrency, retries, manifest, manifest_path):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.manifest = manifest
+        self.manifest_path = manifest_path
+        self.pending_flush = 0
+        self.counts = {"downloaded": 0, "cached": 0, "repaired": 0, "missing": 0, "failed": 0}
+        self.bytes_fetched = 0
+        self.fetch_seconds = 0.0
+
+    def record(self, cid, status, **extra):
+        self.manifest[cid.lower()] = dict(extra, status=status, at=time.time())
+        self.pending_flush += 1
+        if self.pending_flush >= MANIFEST_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        save_manifest(self.manifest_path, self.manifest)
+        icon_store.flush()
+        negative_cache.flush()
+        self.pending_flush = 0
+
+    async def fetch(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session.get(url, timeout=REQUEST_TIMEOUT) as resp:
+                    if resp.status == 200:
+                        return await resp.read()
+                    if resp.status == 404:
+                        return None
+                    retry_after = resp.headers.get("Retry-After")
+                    if resp.status != 429 and resp.status < 500:
+                        raise RuntimeError(f"HTTP {resp.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retry_after = None
+                if attempt == self.retries:
+                    raise RuntimeError(str(e) or type(e).__name__)
+            if attempt < self.retries:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise RuntimeError("reintentos agotados")
+
+    async def warm(self, cid):
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            entry = self.manifest.get(cid.lower())
+            if icon_store.contains(cid) or await loop.run_in_executor(None, icon_store.adopt_legacy, cid):
+                if await loop.run_in_executor(None, icon_store.verify, cid):
+                    self.counts["cached"] += 1
+                    if not entry or entry.get("status") != "ok":
+                        self.record(cid, "ok", digest=icon_store.digest_for(cid))
+                    return
+                self.counts["repaired"] += 1
+            elif entry and entry.get("status") == "missing" and negative_cache.is_negative(f"img:{cid.lower()}"):
+                self.counts["missing"] += 1
+                return
+
+            urls = [
+                f"https://fortnite-api.com/images/cosmetics/br/{cid}/icon.png",
+                f"https://fortnite-api.com/images/cosmetics/br/{cid}/smallicon.png"
+            ]
+            start = time.perf_counter()
+            try:
+                content = None
+                for url in urls:
+                    content = await self.fetch(url)
+                    if content:
+                        break
+            except RuntimeError as e:
+                self.counts["failed"] += 1
+                self.record(cid, "failed", error=str(e))
+                print(f"Error descargando {cid}: {e}")
+                return
+            finally:
+                self.fetch_seconds += time.perf_counter() - start
+
+            if not content:
+                negative_cache.record_miss(f"img:{cid.lower()}")
+                self.counts["missing"] += 1
+                self.record(cid, "missing")
+                print(f"Image is missing {cid}, se reintentará más tarde.")
+                return
+
+            await loop.run_in_executor(None, icon_store.put, cid, content)
+            negative_cache.clear(f"img:{cid.lower()}")
+            self.bytes_fetched += len(content)
+            self.counts["downloaded"] += 1
+            self.record(cid, "ok", digest=icon_store.digest_for(cid), bytes=len(content))
 
 async def main():
-    skin_ids = read_skin_ids("skins.txt")
-    async with aiohttp.ClientSession() as session:
-        tasks = [download_image(session, id) for id in skin_ids]
-        await asyncio.gather(*tasks)
+    parser = argparse.ArgumentParser(description="Precarga la cache de iconos a partir de skins.txt.")
+    parser.add_argument("--ids", default="skins.txt")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    args = parser.parse_args()
+
+    skin_ids = list(dict.fromkeys(read_skin_ids(args.ids)))
+    manifest = load_manifest(args.manifest)
+    start = time.perf_counter()
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        warmer = Warmer(session, args.concurrency, args.retries, manifest, args.manifest)
+        try:
+            await asyncio.gather(*[warmer.warm(cid) for cid in skin_ids])
+        finally:
+            warmer.flush()
+
+    elapsed = time.perf_counter() - start
+    fetched = warmer.counts["downloaded"]
+    per_item = warmer.fetch_seconds / fetched if fetched else 0.0
+    print(
+        f"{len(skin_ids)} ids en {elapsed:.1f}s: "
+        + ", ".join(f"{k} {v}" for k, v in warmer.counts.items())
+    )
+    print(f"Descargados {warmer.bytes_fetched / 1024 ** 2:.1f} MiB, {per_item * 1000:.0f} ms por ítem descargado")
+    return 1 if warmer.counts["failed"] else 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
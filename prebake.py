@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import multiprocessing
+import concurrent.futures
+
+from bot import (
+    cosmetic_catalog, cosmetic_info_from_entry, icon_store, prebaked_tiles, rarity_version_map,
+    _prebake_tile, _render_worker_init
+)
+
+MANIFEST_FLUSH_EVERY = 200
+
+def read_skin_ids(file_path):
+    with open(file_path, 'r') as file:
+        return [line.strip() for line in file if line.strip()]
+
+def build_jobs(skin_ids, versions):
+    jobs = []
+    skipped = 0
+    for cid in dict.fromkeys(skin_ids):
+        entry = cosmetic_catalog.get(cid)
+        digest = icon_store.digest_for(cid)
+        if cid.lower().startswith("banner_") or entry is None or digest is None:
+            skipped += 1
+            continue
+        info = cosmetic_info_from_entry(cid, entry)
+        for version in versions:
+            if prebaked_tiles.is_current(version, cid, info["rarity"], info["name"], digest):
+                continue
+            backgrounds = rarity_version_map[version]
+            jobs.append({
+                "cid": cid,
+                "name": info["name"],
+                "rarity": info["rarity"],
+                "background_path": backgrounds.get(info["rarity"], backgrounds["Common"]),
+                "substitute_image_url": None,
+                "rarity_version": version,
+                "icon_path": icon_store.path_for(cid),
+                "icon_digest": digest,
+                "icon_levels": icon_store.mipmap_levels(digest),
+                "size": prebaked_tiles.tile_size,
+                "path": prebaked_tiles.tile_path(version, cid),
+            })
+    return jobs, skipped
+
+def main():
+    versions = sys.argv[1:] or list(rarity_version_map)
+    unknown = [v for v in versions if v not in rarity_version_map]
+    if unknown:
+        print(f"Versiones desconocidas: {', '.join(unknown)}")
+        return
+
+    if not cosmetic_catalog.load_store() and not cosmetic_catalog.load_snapshot():
+        print("No hay catálogo de cosméticos local, arranca el bot o ejecuta descargar.py primero.")
+        return
+    prebaked_tiles.load()
+
+    jobs, skipped = build_jobs(read_skin_ids("skins.txt"), versions)
+    print(f"{len(jobs)} tiles pendientes ({skipped} ids sin metadatos o sin icono en cache)")
+    if not jobs:
+        return
+
+    start = time.perf_counter()
+    done = 0
+    written = 0
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_render_worker_init
+    )
+    try:
+        for job, size in zip(jobs, executor.map(_prebake_tile, jobs, chunksize=16)):
+            prebaked_tiles.record(job["rarity_version"], job["cid"], job["rarity"], job["name"], job["icon_digest"])
+            done += 1
+            written += size
+            if done % MANIFEST_FLUSH_EVERY == 0:
+                prebaked_tiles.flush()
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(jobs)} tiles ({done / elapsed:.1f}/s)")
+    except KeyboardInterrupt:
+        print("Interrumpido, guardando progreso...")
+    finally:
+        prebaked_tiles.flush()
+        executor.shutdown(cancel_futures=True)
+
+    print(f"Tiles generados: {done} ({written / 1024 ** 2:.1f} MiB) en {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+import bot
+from bot import ApiScheduler, CircuitBreaker, TokenBucket, UpstreamUnavailable, _parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status, data=None, headers=None):
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def json(self):
+        return self.data
+
+    async def read(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(bot, "FORTNITE_API_BACKOFF", 0.001)
+
+
+def scheduler(retries=3):
+    return ApiScheduler(rate=1000, burst=1000, retries=retries)
+
+
+def test_retries_server_errors_then_succeeds():
+    api = scheduler()
+    session = FakeSession([FakeResponse(503), aiohttp.ClientConnectionError("reset"), FakeResponse(200, {"ok": 1})])
+
+    resp = asyncio.run(api.get(session, "https://fortnite-api.com/x"))
+    assert resp.status == 200
+    assert resp.data == {"ok": 1}
+    assert session.calls == 3
+    assert api.counters["retries"] == 2
+    assert api.breaker.failures == 0
+
+
+def test_client_errors_are_returned_without_retry():
+    api = scheduler()
+    session = FakeSession([FakeResponse(404)])
+
+    resp = asyncio.run(api.get(session, "https://fortnite-api.com/x"))
+    assert resp.status == 404
+    assert resp.data is None
+    assert session.calls == 1
+
+
+def test_exhausted_retries_raise_upstream_unavailable():
+    api = scheduler(retries=2)
+    session = FakeSession([FakeResponse(500)] * 3)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(api.get(session, "https://fortnite-api.com/x"))
+    assert session.calls == 3
+    assert api.counters["failed"] == 1
+
+
+def test_long_retry_after_gives_up_immediately():
+    api = scheduler()
+    session = FakeSession([FakeResponse(429, headers={"Retry-After": "3600"})])
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(api.get(session, "https://fortnite-api.com/x"))
+    assert session.calls == 1
+    assert api.counters["throttled"] == 1
+
+
+def test_breaker_opens_after_threshold_and_short_circuits(monkeypatch):
+    monkeypatch.setattr(bot, "FORTNITE_API_BREAKER_THRESHOLD", 2)
+    api = scheduler(retries=0)
+    session = FakeSession([FakeResponse(500), FakeResponse(500)])
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(UpstreamUnavailable):
+                await api.get(session, "https://fortnite-api.com/x")
+        with pytest.raises(UpstreamUnavailable):
+            await api.get(session, "https://fortnite-api.com/x")
+
+    asyncio.run(scenario())
+    assert session.calls == 2
+    assert api.breaker.state == "open"
+    assert api.counters["short_circuited"] == 1
+
+
+def test_breaker_half_opens_after_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(bot.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_failure_reopens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(bot.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(3):
+        breaker.record_failure()
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=100, burst=2)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(scenario()) >= 0.035
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after("5") == 5.0
+    assert _parse_retry_after("-3") == 0.0
+    assert _parse_retry_after("") is None
+    assert _parse_retry_after("soon") is None
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_scheduler_without_breaker_never_short_circuits(monkeypatch):
+    monkeypatch.setattr(bot, "FORTNITE_API_BREAKER_THRESHOLD", 1)
+    api = ApiScheduler(rate=1000, burst=1000, retries=0, breaker=False)
+    session = FakeSession([FakeResponse(500), FakeResponse(500), FakeResponse(200, b"png")])
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(UpstreamUnavailable):
+                await api.get(session, "https://fortnite-api.com/images/x.png", read="bytes")
+        return await api.get(session, "https://fortnite-api.com/images/x.png", read="bytes")
+
+    assert asyncio.run(scenario()).data == b"png"
+    assert api.counters["short_circuited"] == 0
+    assert "breaker" not in api.stats()
+
+
+def test_icon_downloads_do_not_use_the_api_bucket():
+    assert bot.fortnite_cdn is not bot.fortnite_api
+    assert bot.fortnite_cdn.breaker is None
+    assert bot.fortnite_cdn.bucket.rate > bot.fortnite_api.bucket.rate
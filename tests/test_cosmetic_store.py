@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import bot
+from bot import CosmeticCatalog, CosmeticStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_open_the_database(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run(
+        [sys.executable, "-c", "import bot; assert bot._cosmetic_store is None"],
+        cwd=tmp_path, env=env, check=True, capture_output=True
+    )
+    assert not (tmp_path / "cosmetics.db").exists()
+
+
+def test_database_path_is_next_to_the_bot():
+    assert os.path.dirname(bot.COSMETICS_DB_FILE) == ROOT
+
+
+def test_prune_removes_items_missing_from_the_catalog(tmp_path):
+    store = CosmeticStore(str(tmp_path / "cosmetics.db"))
+    entries = [
+        {"id": cid, "name": cid, "rarity": "Rare", "series": None, "icon": None, "smallicon": None}
+        for cid in ("cid_a", "cid_b", "cid_c")
+    ]
+    store.upsert_cosmetics(entries)
+    assert store.prune_cosmetics(["cid_a", "cid_c"]) == 1
+    catalog = CosmeticCatalog(store, snapshot_path=str(tmp_path / "snapshot.json"))
+    assert catalog.load_store()
+    assert sorted(catalog.items) == ["cid_a", "cid_c"]
@@ -0,0 +1,70 @@
+import io
+import os
+
+from PIL import Image
+
+from bot import IconStore
+
+
+def png_bytes(color) -> bytes:
+    f = io.BytesIO()
+    Image.new("RGBA", (64, 64), color).save(f, "PNG")
+    return f.getvalue()
+
+
+def new_store(tmp_path, max_bytes=1024 ** 3) -> IconStore:
+    return IconStore(root=str(tmp_path), max_bytes=max_bytes, placeholder_path=str(tmp_path / "missing.png"))
+
+
+class EvictOnSecondEnter:
+    def __init__(self, store, digest):
+        self.store = store
+        self.digest = digest
+        self.lock = store._lock
+        self.enters = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.enters += 1
+        if self.enters == 2:
+            self.store._drop_object(self.digest)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.lock.release()
+        return False
+
+
+def test_put_deduplicates_identical_icons(tmp_path):
+    store = new_store(tmp_path)
+    data = png_bytes((255, 0, 0, 255))
+    assert store.put("cid_a", data) == store.put("cid_b", data)
+    assert store.stats()["objects"] == 1
+    assert store.digest_for("cid_a") == store.digest_for("cid_b")
+
+
+def test_put_rewrites_object_evicted_between_locks(tmp_path):
+    store = new_store(tmp_path)
+    data = png_bytes((0, 255, 0, 255))
+    path = store.put("cid_a", data)
+    digest = store.digest_for("cid_a")
+
+    store._lock = EvictOnSecondEnter(store, digest)
+    assert store.put("cid_b", data) == path
+    store._lock = store._lock.lock
+
+    assert os.path.exists(path)
+    assert store.digest_for("cid_b") == digest
+    assert store.mipmap_levels(digest)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    store = new_store(tmp_path)
+    store.put("cid_a", png_bytes((1, 0, 0, 255)))
+    store.put("cid_b", png_bytes((2, 0, 0, 255)))
+    store.path_for("cid_a")
+    store.max_bytes = store.stats()["bytes"] * 5 // 4
+    store.put("cid_c", png_bytes((3, 0, 0, 255)))
+    assert store.digest_for("cid_a") is not None
+    assert store.digest_for("cid_b") is None
+    assert store.digest_for("cid_c") is not None
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import json
+import time
+
+from PIL import Image
+
+import bot
+from bot import ApiResponse, CosmeticCatalog, CosmeticStore, IconStore, NegativeCache, RenderPool, TileCache
+
+
+def catalog_dump(count: int) -> bytes:
+    return json.dumps({"status": 200, "data": [
+        {
+            "id": f"CID_{i:05d}_Athena_Commando_M",
+            "name": f"Item {i}",
+            "description": "x" * 120,
+            "rarity": {"value": "rare", "displayValue": "Rare", "backendValue": "EFortRarity::Rare"},
+            "series": None,
+            "images": {
+                "smallIcon": f"https://fortnite-api.com/images/cosmetics/br/cid_{i:05d}/smallicon.png",
+                "icon": f"https://fortnite-api.com/images/cosmetics/br/cid_{i:05d}/icon.png",
+            },
+            "gameplayTags": ["Cosmetics.Source.ItemShop"] * 6,
+        }
+        for i in range(count)
+    ]}).encode("utf-8")
+
+
+async def max_lag_during(coro, interval: float = 0.005) -> float:
+    lags = []
+    done = False
+
+    async def sample():
+        while not done:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            lags.append(time.monotonic() - start - interval)
+
+    sampler = asyncio.create_task(sample())
+    await asyncio.sleep(interval * 4)
+    try:
+        result = await coro
+    finally:
+        done = True
+        await sampler
+    return result, max(lags)
+
+
+def test_catalog_refresh_keeps_loop_responsive(tmp_path, monkeypatch):
+    raw = catalog_dump(20000)
+
+    async def busy_pool(fn, items):
+        raise AssertionError("catalog parsing must not queue behind renders")
+
+    monkeypatch.setattr(bot.render_pool, "map", busy_pool)
+
+    async def fake_get(session, url, read="json", **kwargs):
+        assert read == "bytes"
+        return ApiResponse(200, raw, {"ETag": '"v1"'})
+
+    monkeypatch.setattr(bot.fortnite_api, "get", fake_get)
+    store = CosmeticStore(str(tmp_path / "cosmetics.db"))
+    catalog = CosmeticCatalog(store, snapshot_path=str(tmp_path / "cosmetics.json"))
+
+    refreshed, lag = asyncio.run(max_lag_during(catalog.refresh(None)))
+
+    assert refreshed
+    assert len(catalog.items) == 20000
+    assert catalog.get("cid_00042_athena_commando_m")["rarity"] == "Rare"
+    assert store.get_meta("catalog_etag") == '"v1"'
+    assert (tmp_path / "cosmetics.json").read_bytes() == raw
+    assert lag < bot.LOOP_BLOCK_BUDGET, f"loop blocked {lag * 1000:.0f} ms"
+
+
+def icon_png(seed: int) -> bytes:
+    noise = Image.effect_noise((512, 512), 40 + seed)
+    img = Image.merge("RGBA", (noise, noise.rotate(90), noise.rotate(180), Image.new("L", (512, 512), 255)))
+    f = io.BytesIO()
+    img.save(f, "PNG")
+    return f.getvalue()
+
+
+def test_createimg_keeps_loop_responsive(tmp_path, monkeypatch):
+    ids = [f"cid_{i:03d}_athena_commando_m" for i in range(48)]
+    rarities = ["Common", "Rare", "Epic", "Legendary", "Icon Series", "Mythic"]
+    catalog = CosmeticCatalog(CosmeticStore(str(tmp_path / "cosmetics.db")))
+    catalog.load_entries([
+        {"id": cid, "name": f"Item {i}", "rarity": rarities[i % len(rarities)],
+         "series": None, "icon": None, "smallicon": None}
+        for i, cid in enumerate(ids)
+    ])
+    monkeypatch.chdir(tmp_path)
+    icons = IconStore()
+    for i, cid in enumerate(ids):
+        icons.put(cid, icon_png(i % 8))
+
+    pool = RenderPool(max_workers=2)
+    monkeypatch.setattr(bot, "render_pool", pool)
+    monkeypatch.setattr(bot, "cosmetic_catalog", catalog)
+    monkeypatch.setattr(bot, "icon_store", icons)
+    monkeypatch.setattr(bot, "tile_cache", TileCache(spill_dir=None))
+    monkeypatch.setattr(bot, "negative_cache", NegativeCache(path=str(tmp_path / "negative.json")))
+    monkeypatch.setattr(bot, "USER_CONFIG_FOLDER", str(tmp_path / "user_config"))
+
+    async def scenario():
+        await pool.map(abs, [0, 0])
+        ctx = bot.CheckContext()
+        ctx.plan_image(ids)
+        return await max_lag_during(bot.createimg(
+            ids, None, username="t", discord_user_id=1, for_discord=False, ctx=ctx
+        ))
+
+    try:
+        image, lag = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert Image.open(image).size[0] > 0
+    assert lag < bot.LOOP_BLOCK_BUDGET, f"loop blocked {lag * 1000:.0f} ms"
+
+
+def test_command_is_attributed_to_child_tasks():
+    seen = []
+
+    async def render_group():
+        seen.append(bot._task_commands.get(asyncio.current_task()))
+
+    async def todo_task():
+        await asyncio.gather(render_group(), render_group())
+
+    async def scenario():
+        asyncio.get_running_loop().set_task_factory(bot._command_task_factory)
+        await bot.start_command_task(todo_task())
+        await asyncio.create_task(render_group())
+
+    asyncio.run(scenario())
+    assert seen == ["todo_task", "todo_task", None]
+
+
+def test_over_budget_stretch_is_logged_once(caplog):
+    monitor = bot.LoopMonitor()
+    budget = bot.LOOP_BLOCK_BUDGET
+    with caplog.at_level("WARNING", logger="bot"):
+        for lag in [0.0, budget * 2, budget * 3, budget * 2, 0.0, 0.0, budget * 4, 0.0]:
+            monitor._record(lag)
+
+    warnings = [r.getMessage() for r in caplog.records if "bloqueado" in r.getMessage()]
+    assert len(warnings) == 2
+    assert "3 muestras seguidas" in warnings[0]
+    assert f"max {budget * 3000:.0f} ms" in warnings[0]
+    assert len(monitor.samples) == 8
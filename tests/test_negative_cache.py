@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import bot
+from bot import NegativeCache
+
+
+def make_cache(tmp_path, ttl=60, max_ttl=600):
+    return NegativeCache(path=str(tmp_path / "negative.json"), ttl=ttl, max_ttl=max_ttl)
+
+
+def test_miss_is_negative_until_ttl_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("bot.time.time", lambda: now[0])
+    cache = make_cache(tmp_path)
+
+    assert not cache.is_negative("img:cid_001")
+    cache.record_miss("img:cid_001")
+    assert cache.is_negative("img:cid_001")
+
+    now[0] += 59
+    assert cache.is_negative("img:cid_001")
+    now[0] += 2
+    assert not cache.is_negative("img:cid_001")
+
+
+def test_repeated_misses_back_off_up_to_max_ttl(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot.time.time", lambda: now[0])
+    cache = make_cache(tmp_path, ttl=60, max_ttl=200)
+
+    expiries = []
+    for _ in range(4):
+        cache.record_miss("info:cid_002")
+        expiries.append(cache._entries["info:cid_002"][0] - now[0])
+    assert expiries == [60, 120, 200, 200]
+
+
+def test_clear_forgets_the_miss_count(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot.time.time", lambda: now[0])
+    cache = make_cache(tmp_path)
+
+    cache.record_miss("k")
+    cache.record_miss("k")
+    cache.clear("k")
+    assert not cache.is_negative("k")
+    cache.record_miss("k")
+    assert cache._entries["k"] == [60, 1]
+
+
+def test_flush_persists_entries_for_the_next_process(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot.time.time", lambda: now[0])
+    cache = make_cache(tmp_path)
+    cache.record_miss("img:cid_003")
+    cache.flush()
+
+    with open(tmp_path / "negative.json", "r", encoding="utf-8") as f:
+        assert json.load(f) == {"img:cid_003": [60, 1]}
+    reloaded = make_cache(tmp_path)
+    assert reloaded.is_negative("img:cid_003")
+    now[0] += 61
+    assert not reloaded.is_negative("img:cid_003")
+
+
+def test_unreadable_file_starts_empty(tmp_path):
+    (tmp_path / "negative.json").write_text("{not json", encoding="utf-8")
+    cache = make_cache(tmp_path)
+    assert not cache.is_negative("anything")
+
+
+def test_unknown_banner_is_not_refetched_while_negative(tmp_path, monkeypatch):
+    store = bot.CosmeticStore(str(tmp_path / "cosmetics.db"))
+    monkeypatch.setattr(bot, "get_cosmetic_store", lambda: store)
+    monkeypatch.setattr(bot, "negative_cache", make_cache(tmp_path))
+    monkeypatch.setattr(bot, "icon_store", bot.IconStore(root=str(tmp_path / "icons")))
+
+    async def fake_banners(session, user):
+        return ["BrSeason01", "GoneBanner"]
+
+    calls = []
+
+    async def fake_get(session, url, read="json", **kwargs):
+        calls.append(url)
+        if read == "bytes":
+            return bot.ApiResponse(404, None, {})
+        return bot.ApiResponse(200, {"data": [
+            {"id": "BrSeason01", "devName": "Season 1", "images": {"icon": "https://fortnite-api.com/b.png"}}
+        ]}, {})
+
+    monkeypatch.setattr(bot, "get_banners_from_common_core", fake_banners)
+    monkeypatch.setattr(bot.fortnite_api, "get", fake_get)
+
+    asyncio.run(bot.download_and_prepare_banners(None, None))
+    asyncio.run(bot.download_and_prepare_banners(None, None))
+
+    assert calls.count("https://fortnite-api.com/v1/banners") == 1
+    assert bot.negative_cache.is_negative("banner:gonebanner")
+    assert not bot.negative_cache.is_negative("banner:brseason01")
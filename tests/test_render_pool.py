@@ -0,0 +1,53 @@
+import asyncio
+import os
+import time
+
+import bot
+from bot import RenderPool
+
+
+def hang_once(marker: str) -> int:
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        time.sleep(60)
+    return os.getpid()
+
+
+def test_pool_recycles_workers_without_hanging():
+    pool = RenderPool(max_workers=2, recycle_after=3)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(*[pool.map(abs, [-i, -i - 1]) for i in range(30)]),
+            timeout=60
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert results == [[i, i + 1] for i in range(30)]
+    assert pool.generation > 1
+    assert pool.stats()["jobs"] == 60
+
+
+def test_health_check_terminates_hung_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "RENDER_POOL_HUNG_TIMEOUT", 0.5)
+    pool = RenderPool(max_workers=1)
+    marker = str(tmp_path / "hung")
+
+    async def scenario():
+        assert await pool.health_check()
+        hung = asyncio.create_task(pool.map(hang_once, [marker]))
+        other = asyncio.create_task(pool.map(abs, [-1, -2]))
+        await asyncio.sleep(1.5)
+        assert not await pool.health_check()
+        return await asyncio.wait_for(asyncio.gather(hung, other), timeout=60)
+
+    try:
+        (pid,), others = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert others == [1, 2]
+    assert pool.restarts == 1
+    assert pid in pool._collect_pids()
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from bot import RenderRejected, RenderScheduler
+
+
+async def hold(ticket, order, label, release, on_position=None):
+    async with ticket.slot(on_position):
+        order.append(label)
+        await release.wait()
+    ticket.close()
+
+
+def test_slots_rotate_between_users():
+    async def scenario():
+        scheduler = RenderScheduler(max_concurrent=1, queue_limit=10, user_limit=3, cooldown=0)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(scheduler.admit(1), order, "a1", release))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(hold(scheduler.admit(user), order, label, release))
+            for user, label in ((1, "a2"), (1, "a3"), (2, "b1"))
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.waiting() == 3
+        release.set()
+        await asyncio.gather(first, *queued)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a1", "a2", "b1", "a3"]
+    assert stats["active"] == 0
+    assert stats["completed"] == 4
+
+
+def test_admit_rejects_duplicate_checks():
+    scheduler = RenderScheduler(max_concurrent=1, queue_limit=1, user_limit=1, cooldown=0)
+    scheduler.admit(1)
+    with pytest.raises(RenderRejected):
+        scheduler.admit(1)
+    assert scheduler.counters["rejected"] == 1
+
+
+def test_logins_in_progress_do_not_use_capacity():
+    scheduler = RenderScheduler(max_concurrent=1, queue_limit=1, user_limit=1, cooldown=0)
+    tickets = [scheduler.admit(user) for user in range(10)]
+    assert len(tickets) == 10
+    assert scheduler.counters["rejected"] == 0
+
+
+def test_full_queue_rejects_at_render_time():
+    async def scenario():
+        scheduler = RenderScheduler(max_concurrent=1, queue_limit=1, user_limit=1, cooldown=0)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(scheduler.admit(1), order, "a", release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold(scheduler.admit(2), order, "b", release))
+        await asyncio.sleep(0)
+        late = scheduler.admit(3)
+        with pytest.raises(RenderRejected):
+            async with late.slot():
+                order.append("c")
+        late.close()
+        release.set()
+        await asyncio.gather(running, queued)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a", "b"]
+    assert stats["rejected"] == 1
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_cooldown_applies_only_after_a_render():
+    async def scenario():
+        scheduler = RenderScheduler(max_concurrent=1, queue_limit=1, user_limit=1, cooldown=60)
+        scheduler.admit(1).close()
+        ticket = scheduler.admit(1)
+        async with ticket.slot():
+            pass
+        ticket.close()
+        with pytest.raises(RenderRejected):
+            scheduler.admit(1)
+
+    asyncio.run(scenario())
+
+
+def test_cancel_while_queued_leaves_no_trace():
+    async def scenario():
+        scheduler = RenderScheduler(max_concurrent=1, queue_limit=10, user_limit=1, cooldown=0)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(scheduler.admit(1), order, "a", release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(scheduler.admit(2), order, "b", release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.waiting() == 0
+        release.set()
+        await first
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a"]
+    assert stats["active"] == 0
+
+
+def test_cancel_during_start_notification_releases_slot():
+    async def scenario():
+        scheduler = RenderScheduler(max_concurrent=1, queue_limit=10, user_limit=1, cooldown=0)
+        order, release = [], asyncio.Event()
+        notified = asyncio.Event()
+
+        async def on_position(position):
+            if position is None:
+                notified.set()
+                await asyncio.Event().wait()
+
+        first = asyncio.create_task(hold(scheduler.admit(1), order, "a", release))
+        await asyncio.sleep(0)
+        second = scheduler.admit(2)
+        waiter = asyncio.create_task(hold(second, order, "b", asyncio.Event(), on_position))
+        await asyncio.sleep(0)
+        release.set()
+        await first
+        await notified.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return order, scheduler.stats(), second.rendered
+
+    order, stats, rendered = asyncio.run(scenario())
+    assert order == ["a"]
+    assert stats["active"] == 0
+    assert not rendered
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from bot import SingleFlight
+
+
+def test_concurrent_calls_share_one_factory_run():
+    async def scenario():
+        flight = SingleFlight()
+        runs = 0
+
+        async def factory():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return "icon"
+
+        results = await asyncio.gather(*[flight.do("img:cid_001", factory) for _ in range(10)])
+        return flight, runs, results
+
+    flight, runs, results = asyncio.run(scenario())
+    assert runs == 1
+    assert results == ["icon"] * 10
+    assert flight.stats() == {"calls": 10, "coalesced": 9, "in_flight": 0}
+
+
+def test_different_keys_do_not_coalesce():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def factory(value):
+            await asyncio.sleep(0)
+            return value
+
+        return flight, await asyncio.gather(
+            flight.do("a", lambda: factory(1)),
+            flight.do("b", lambda: factory(2)),
+        )
+
+    flight, results = asyncio.run(scenario())
+    assert results == [1, 2]
+    assert flight.coalesced == 0
+
+
+def test_key_is_released_after_completion():
+    async def scenario():
+        flight = SingleFlight()
+        runs = 0
+
+        async def factory():
+            nonlocal runs
+            runs += 1
+            return runs
+
+        first = await flight.do("k", factory)
+        second = await flight.do("k", factory)
+        return first, second
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            *[flight.do("k", failing) for _ in range(3)], return_exceptions=True
+        )
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def factory():
+            await gate.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", factory))
+        second = asyncio.create_task(flight.do("k", factory))
+        await asyncio.sleep(0)
+        first.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
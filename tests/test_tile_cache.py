@@ -0,0 +1,101 @@
+import os
+
+from PIL import Image
+
+from bot import TileCache, _tile_cacheable, _tile_key
+
+TILE_BYTES = 8 * 8 * 4
+
+
+def tile(color):
+    return Image.new("RGBA", (8, 8), color)
+
+
+def key(n, size=8):
+    return (f"cid_{n:03d}", "Rare", "v1", f"Item {n}", None, f"digest{n}", size)
+
+
+def test_lru_evicts_least_recently_used_by_bytes():
+    cache = TileCache(max_bytes=TILE_BYTES * 2, spill_dir=None)
+    cache.put(key(1), tile("red"))
+    cache.put(key(2), tile("green"))
+    assert cache.get(key(1)) is not None
+    cache.put(key(3), tile("blue"))
+
+    assert cache.get(key(2)) is None
+    assert cache.get(key(1)) is not None
+    assert cache.get(key(3)) is not None
+    stats = cache.stats()
+    assert stats["tiles"] == 2
+    assert stats["bytes"] == TILE_BYTES * 2
+    assert stats["evictions"] == 1
+
+
+def test_oversized_tiles_are_not_cached():
+    cache = TileCache(max_bytes=TILE_BYTES - 1, spill_dir=None)
+    cache.put(key(1), tile("red"))
+    assert cache.stats()["tiles"] == 0
+
+
+def test_evicted_tiles_spill_to_disk_and_come_back(tmp_path):
+    cache = TileCache(max_bytes=TILE_BYTES, spill_dir=str(tmp_path))
+    cache.put(key(1), tile((10, 20, 30, 255)))
+    cache.put(key(2), tile("green"))
+
+    restored = cache.get(key(1))
+    assert restored is not None
+    assert restored.getpixel((0, 0)) == (10, 20, 30, 255)
+    assert cache.spill_hits == 1
+    assert cache.get(key(2)) is not None
+
+
+def test_spill_survives_a_new_instance(tmp_path):
+    cache = TileCache(max_bytes=TILE_BYTES, spill_dir=str(tmp_path))
+    cache.put(key(1), tile("red"))
+    cache.put(key(2), tile("green"))
+
+    fresh = TileCache(max_bytes=TILE_BYTES, spill_dir=str(tmp_path))
+    assert fresh.get(key(1)) is not None
+    assert fresh.spill_hits == 1
+
+
+def test_spill_directory_is_bounded(tmp_path):
+    cache = TileCache(max_bytes=TILE_BYTES, spill_dir=str(tmp_path), spill_max_bytes=200)
+    for n in range(10):
+        cache.put(key(n), tile((n, 0, 0, 255)))
+
+    spilled = sum(f.stat().st_size for f in tmp_path.rglob("*.rgba.z"))
+    assert spilled <= 200
+    assert cache.stats()["spill_bytes"] == spilled
+
+
+def test_spill_hits_survive_the_trim(tmp_path):
+    cache = TileCache(max_bytes=TILE_BYTES, spill_dir=str(tmp_path))
+    for n in range(4):
+        cache.put(key(n), tile((n, 0, 0, 255)))
+
+    assert cache.get(key(0)) is not None
+    mtime = lambda n: os.stat(cache._spill_path(key(n))).st_mtime
+    assert mtime(0) >= mtime(2)
+
+    cache.spill_max_bytes = cache.stats()["spill_bytes"]
+    for n in range(4, 6):
+        cache.put(key(n), tile((n, 0, 0, 255)))
+    cache._tiles.clear()
+    assert cache.get(key(0)) is not None
+    assert cache.get(key(1)) is None
+
+
+def test_placeholder_tiles_are_not_cacheable():
+    args = {"cid": "CID_001", "name": "Item", "rarity": "Rare", "background_path": "bg.png",
+            "rarity_version": "v1", "substitute_image_url": None, "icon_digest": None}
+    assert not _tile_cacheable(_tile_key(args))
+    assert _tile_cacheable(_tile_key(dict(args, icon_digest="abc")))
+    assert _tile_cacheable(_tile_key(dict(args, substitute_image_url="./Estilos/Renegade.png")))
+    assert not _tile_cacheable(_tile_key(dict(args, substitute_image_url="https://example.com/x.png")))
+
+
+def test_key_changes_when_the_icon_changes():
+    args = {"cid": "CID_001", "name": "Item", "rarity": "Rare", "background_path": "bg.png",
+            "rarity_version": "v1", "substitute_image_url": None, "icon_digest": "old"}
+    assert _tile_key(args) != _tile_key(dict(args, icon_digest="new"))